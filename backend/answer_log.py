@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+ANSWER_LOG_NAME = "answers.log"
+
+RECORD_ANSWER = "answer"
+RECORD_SUBMITTED = "submitted"
+
+# fdatasync skips the metadata flush an appended log doesn't need for recovery
+_sync = getattr(os, "fdatasync", os.fsync)
+
+
+class AnswerLog:
+    # Autosaved answers, one append-only JSON-lines file per candidate next to their uploads.
+    # Appends are group-committed: whatever arrives while a batch is being written and synced
+    # goes into the next batch, so each touched file is synced once per batch however many
+    # saves it holds, and a save returns only once it is on disk. The latest revision of each
+    # question wins on replay, which makes reordered or repeated saves harmless; idempotency
+    # keys seen recently are also skipped without touching the disk.
+
+    def __init__(self, root: str, flush_seconds: float = 0.005, max_keys: int = 100_000):
+        self.root = root
+        self.flush_seconds = flush_seconds
+        self.max_keys = max_keys
+        self.appends = 0
+        self.duplicates = 0
+        self.batches = 0
+        self._pending: List[Tuple[str, bytes, Optional[str], asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._keys = OrderedDict()
+        # Serializes batch writes against removing a compacted log
+        self._write_lock = Lock()
+
+    def path(self, candidate_id: str) -> str:
+        return os.path.join(self.root, candidate_id, ANSWER_LOG_NAME)
+
+    # --- Appends ---
+
+    async def append_answer(self, candidate_id: str, section: str, index: int, revision: int, answer: dict,
+                            key: Optional[str] = None) -> bool:
+        # False when `key` was already saved
+        if key is not None and (candidate_id, key) in self._keys:
+            self.duplicates += 1
+            return False
+        record = {"type": RECORD_ANSWER, "section": section, "index": index, "revision": revision,
+                  "answer": answer, "key": key, "at": time.time()}
+        await self._append(candidate_id, record, key)
+        return True
+
+    async def _append(self, candidate_id: str, record: dict, key: Optional[str] = None):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((candidate_id, orjson.dumps(record) + b"\n", key, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        # The write goes ahead even if this request is cancelled
+        await asyncio.shield(future)
+
+    async def _flush(self):
+        while self._pending:
+            if self.flush_seconds > 0:
+                await asyncio.sleep(self.flush_seconds)
+            batch, self._pending = self._pending, []
+            try:
+                errors = await run_in_threadpool(self._write_batch, batch)
+            except Exception as e:
+                errors = {candidate_id: e for candidate_id, *_ in batch}
+            self.batches += 1
+            for candidate_id, _, key, future in batch:
+                error = errors.get(candidate_id)
+                if error is None:
+                    self.appends += 1
+                    if key is not None:
+                        self._remember(candidate_id, key)
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+
+    def _write_batch(self, batch) -> Dict[str, Exception]:
+        # A failing file only fails the saves of its own candidate
+        lines: Dict[str, List[bytes]] = {}
+        for candidate_id, line, _, _ in batch:
+            lines.setdefault(candidate_id, []).append(line)
+        errors = {}
+        with self._write_lock:
+            for candidate_id, candidate_lines in lines.items():
+                try:
+                    with open(self.path(candidate_id), "ab") as f:
+                        f.write(b"".join(candidate_lines))
+                        f.flush()
+                        _sync(f.fileno())
+                except OSError as e:
+                    errors[candidate_id] = e
+        return errors
+
+    def _remember(self, candidate_id: str, key: str):
+        self._keys[(candidate_id, key)] = None
+        self._keys.move_to_end((candidate_id, key))
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+
+    async def close(self):
+        # Lets queued saves reach the disk before shutdown
+        if self._flusher is not None:
+            await self._flusher
+
+    # --- Replay ---
+
+    def replay(self, candidate_id: str) -> dict:
+        # {"answers": {section: {index: record}}, "submitted": [section, ...]}; answers of
+        # submitted sections are left out, they live in the section files now
+        answers: Dict[str, Dict[int, dict]] = {}
+        submitted = []
+        try:
+            with open(self.path(candidate_id), "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # A torn last line from a crash mid-write
+                continue
+            if record["type"] == RECORD_SUBMITTED:
+                submitted.append(record["section"])
+                continue
+            section = answers.setdefault(record["section"], {})
+            current = section.get(record["index"])
+            if current is None or record["revision"] >= current["revision"]:
+                section[record["index"]] = record
+        for section in submitted:
+            answers.pop(section, None)
+        return {"answers": answers, "submitted": submitted}
+
+    # --- Compaction ---
+
+    async def compact(self, candidate_id: str, section: str, sections: Iterable[str]):
+        # Called once `section` has been written to its section file. The log is removed when
+        # every one of `sections` is in its file, until then the marker hides the section's drafts.
+        await self._append(candidate_id, {"type": RECORD_SUBMITTED, "section": section, "at": time.time()})
+        await run_in_threadpool(self._remove_if_submitted, candidate_id, set(sections))
+
+    def _remove_if_submitted(self, candidate_id: str, sections: set):
+        with self._write_lock:
+            if sections <= set(self.replay(candidate_id)["submitted"]):
+                os.remove(self.path(candidate_id))
+
+    def stats(self) -> dict:
+        return {
+            "appends": self.appends,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+            "appends_per_batch": round(self.appends / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,75 @@
+import json
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, String, Text, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, SessionLocal, engine
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, get_latest_jobs
+
+
+class CandidateBatch(Base):
+    __tablename__ = "candidate_batches"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer)
+    rejected: Mapped[str] = mapped_column(Text, default="[]")
+    created_at: Mapped[float] = mapped_column(Float)
+
+
+class BatchCandidate(Base):
+    __tablename__ = "batch_candidates"
+
+    batch_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    candidate_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    filename: Mapped[str] = mapped_column(String(512))
+
+
+def create_batch(batch_id: str, members: List[Tuple[str, str]], rejected: List[dict]):
+    # `members` are (candidate_id, filename) pairs
+    with SessionLocal() as session:
+        session.add(CandidateBatch(id=batch_id, total=len(members), rejected=json.dumps(rejected),
+                                   created_at=time.time()))
+        session.add_all([BatchCandidate(batch_id=batch_id, candidate_id=candidate_id, filename=filename)
+                         for candidate_id, filename in members])
+        session.commit()
+
+
+def get_batch_status(batch_id: str) -> Optional[dict]:
+    with engine.connect() as connection:
+        batch = connection.execute(select(CandidateBatch).where(CandidateBatch.id == batch_id)).first()
+        if batch is None:
+            return None
+        members = connection.execute(
+            select(BatchCandidate.candidate_id, BatchCandidate.filename)
+            .where(BatchCandidate.batch_id == batch_id).order_by(BatchCandidate.filename)
+        ).all()
+
+    jobs = get_latest_jobs([candidate_id for candidate_id, _ in members])
+    counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+    candidates = []
+    last_finished = None
+    for candidate_id, filename in members:
+        job = jobs.get(candidate_id)
+        status = job.status if job is not None else QUEUED
+        counts[status] += 1
+        item = {"candidate_id": candidate_id, "filename": filename, "status": status}
+        if job is not None and job.status == FAILED:
+            item["error"] = job.last_error
+        if job is not None and job.finished_at is not None:
+            last_finished = max(last_finished or 0, job.finished_at)
+        candidates.append(item)
+
+    finished = counts[SUCCEEDED] + counts[FAILED]
+    elapsed = (last_finished - batch.created_at) if last_finished else None
+    return {
+        "batch_id": batch.id,
+        "total": batch.total,
+        "counts": counts,
+        "done": finished == batch.total,
+        "created_at": batch.created_at,
+        "candidates_per_minute": round(finished * 60 / elapsed, 1) if elapsed else None,
+        "rejected": json.loads(batch.rejected),
+        "candidates": candidates,
+    }
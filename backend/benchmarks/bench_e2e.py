@@ -0,0 +1,206 @@
+# End-to-end load test of the full candidate flow with a fake LLM.
+#
+#   cd backend && python benchmarks/bench_e2e.py --candidates 40 --concurrency 10 --latency 1.0
+#
+# Every simulated candidate uploads a resume and JD, long-polls get_mcq, fetches the theory
+# and coding questions, submits all three sections, generates the final result and downloads
+# the ZIP. Throughput and per-endpoint p50/p95/p99 latencies are printed at the end.
+#
+# The app runs in-process (httpx ASGI transport) by default, or under uvicorn with --uvicorn.
+# --record PATH runs against the real Gemini model (GOOGLE_API_KEY required) and records its
+# responses; --replay PATH serves them back offline with the recorded latencies.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_uploads import free_port, percentile, start_server
+from fake_llm import FakeChatModel, RecordingChatModel, ReplayChatModel
+
+JOB_DESCRIPTION = {
+    "requirements": "Backend engineer: Python, REST APIs, SQL, data structures and algorithms.",
+    "difficulty_level": "Intermediate",
+    "test_details": {
+        "MCQ": {"no_of_questions": 5, "marks_per_question": 1},
+        "Theory": {"no_of_questions": 3, "marks_per_question": 5},
+        "Coding": {"no_of_questions": 2, "marks_per_question": 10},
+    },
+}
+
+
+def resume_pdf(i: int) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=11)
+    pdf.multi_cell(0, 6, f"Candidate {i}\ncandidate{i}@example.com\n\nExperience\n" +
+                   "Built REST APIs in Python with FastAPI and PostgreSQL. " * 20)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def build_model(args):
+    if args.replay:
+        return ReplayChatModel(path=args.replay, latency_scale=args.latency_scale, strict=args.strict,
+                               report_chars=args.report_chars, items=args.items, text_words=args.text_words)
+    if args.record:
+        from llm import get_llm_object
+        return RecordingChatModel(inner=get_llm_object(), path=args.record)
+    return FakeChatModel(latency=args.latency, jitter=args.jitter, report_chars=args.report_chars,
+                         items=args.items, text_words=args.text_words)
+
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, name: str, request, expected=(200,)):
+        start = time.perf_counter()
+        response = await request
+        self.samples[name].append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.errors[name] += 1
+            raise RuntimeError(f"{name} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def candidate_flow(client, timings: Timings, i: int, pdf: bytes):
+    response = await timings.call("upload_resume", client.post("/upload_resume", files={
+        "resume": (f"resume_{i}.pdf", pdf, "application/pdf"),
+        "exam_details": ("job_desc.json", json.dumps(JOB_DESCRIPTION), "application/json"),
+    }))
+    candidate_id = response.json()["candidate_id"]
+
+    while True:
+        response = await timings.call("get_mcq", client.get(f"/get_mcq/{candidate_id}", params={"wait": 25}),
+                                      expected=(200, 202))
+        if response.status_code == 200:
+            mcqs = response.json()
+            break
+    theory = (await timings.call("get_theory_question", client.get(
+        f"/get_theory_question/{candidate_id}", params={"wait": 25}))).json()
+    coding = (await timings.call("get_coding_question", client.get(
+        f"/get_coding_question/{candidate_id}", params={"wait": 25}))).json()
+
+    await timings.call("submit_all_mcq_answers", client.post("/submit_all_mcq_answers/", json={
+        "candidate_id": candidate_id,
+        "submitted_mcqs": [{"question": q["question"], "options": q["options"], "submitted_answer": q["options"][0]}
+                           for q in mcqs],
+    }))
+    await timings.call("submit_all_theory_answers", client.post("/submit_all_theory_answers/", json={
+        "candidate_id": candidate_id,
+        "submitted_theory_questions": [{"question": q["question"], "submitted_answer": q["question"][:80]}
+                                       for q in theory],
+    }))
+    await timings.call("submit_all_coding_answers", client.post("/submit_all_coding_answers/", json={
+        "candidate_id": candidate_id,
+        "submitted_coding_questions": [{"question_name": q["name"], "question_description": q["description"],
+                                        "submitted_code": "print(input())", "language": "python"} for q in coding],
+    }))
+    await timings.call("generate_final_result", client.post("/generate_final_result/",
+                                                            params={"candidate_id": candidate_id}))
+    await timings.call("download_zip", client.get("/download_zip/", params={"candidate_id": candidate_id}))
+
+
+async def run(args, client):
+    timings = Timings()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pdfs = [resume_pdf(i) for i in range(args.candidates)]
+    failures = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await candidate_flow(client, timings, i, pdfs[i])
+            except Exception as e:
+                failures.append(str(e))
+                return
+            timings.samples["candidate_flow"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(args.candidates)])
+    return timings, failures, time.perf_counter() - start
+
+
+def report(args, timings: Timings, failures, elapsed: float, model):
+    completed = len(timings.samples["candidate_flow"])
+    print(f"{completed}/{args.candidates} candidates in {elapsed:.1f}s at concurrency {args.concurrency}: "
+          f"{completed * 60 / elapsed:.1f} candidates/min")
+    print(f"{'endpoint':<26} {'n':>5} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}")
+    for name, samples in timings.samples.items():
+        print(f"{name:<26} {len(samples):>5} {statistics.mean(samples):>8.3f}s {percentile(samples, 50):>8.3f}s "
+              f"{percentile(samples, 95):>8.3f}s {percentile(samples, 99):>8.3f}s {max(samples):>8.3f}s "
+              f"{timings.errors[name]:>7}")
+    if isinstance(model, FakeChatModel):
+        print(f"LLM calls: {model.calls}" + (f", replay misses: {model.misses}" if isinstance(model, ReplayChatModel) else ""))
+    for failure in failures[:5]:
+        print(f"failed: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--report-chars", type=int, default=3000)
+    parser.add_argument("--items", type=int, default=5, help="questions per generated section")
+    parser.add_argument("--text-words", type=int, default=12)
+    parser.add_argument("--uvicorn", action="store_true", help="serve the app with uvicorn instead of in-process")
+    parser.add_argument("--record", metavar="PATH")
+    parser.add_argument("--replay", metavar="PATH")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for replayed latencies")
+    parser.add_argument("--strict", action="store_true", help="fail on prompts missing from the recording")
+    args = parser.parse_args()
+    args.record = args.record and os.path.abspath(args.record)
+    args.replay = args.replay and os.path.abspath(args.replay)
+
+    # The app keeps its state relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_e2e_"))
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    import httpx
+    import llm
+    import main as app_main
+
+    model = build_model(args)
+    llm.get_llm_object = lambda: model
+
+    async def in_process():
+        async with app_main.app.router.lifespan_context(app_main.app):
+            transport = httpx.ASGITransport(app=app_main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+                return await run(args, client)
+
+    async def over_http(base_url):
+        async with httpx.AsyncClient(base_url=base_url, timeout=600,
+                                     limits=httpx.Limits(max_connections=args.concurrency * 2)) as client:
+            return await run(args, client)
+
+    if args.uvicorn:
+        port = free_port()
+        server, thread = start_server(port)
+        try:
+            results = asyncio.run(over_http(f"http://127.0.0.1:{port}"))
+        finally:
+            server.should_exit = True
+            thread.join()
+    else:
+        results = asyncio.run(in_process())
+    report(args, *results, model)
+
+
+if __name__ == "__main__":
+    main()
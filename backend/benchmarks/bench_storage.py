@@ -0,0 +1,137 @@
+# Lookup latency of the storage backends with a large candidate population.
+#
+#   cd backend && python benchmarks/bench_storage.py --candidates 100000 --lookups 5000
+#
+# Each backend is populated with the same synthetic candidates (a status and a
+# testoutput.json of realistic size) in a temporary directory, then random
+# candidates are looked up by id and counted by status.
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATUSES = ("generating", "ready", "failed", "completed")
+
+
+def sample_test_output(i: int) -> dict:
+    return {
+        "level": "Intermediate",
+        "questions": [
+            {"question": f"Question {i}.{q} about Python internals?",
+             "options": [f"Option {o}" for o in range(4)], "answer": "Option 1"}
+            for q in range(10)
+        ],
+        "therotical_questions": [
+            {"question": f"Explain concept {q}.", "expected_answer": "A four to five line answer. " * 4}
+            for q in range(5)
+        ],
+        "coding_question": [
+            {"name": f"Problem {q}", "description": "Reverse the words of a sentence.",
+             "example": [{"input": "a b", "expected_output": "b a", "description": "simple"}],
+             "test_cases": [{"input": "x y z", "expected_output": "z y x", "description": "three"}] * 5}
+            for q in range(2)
+        ],
+        "profile": {"name": f"Candidate {i}", "email": f"candidate{i}@example.com"},
+    }
+
+
+def populate_filesystem(store, ids):
+    for i, candidate_id in enumerate(ids):
+        store.create_candidate(candidate_id, STATUSES[i % len(STATUSES)])
+        store.save_document(candidate_id, "testoutput.json", sample_test_output(i))
+
+
+def populate_sql(ids):
+    # Bulk insert: populating row by row through the store would dominate the benchmark
+    import orjson
+    from sqlalchemy import insert
+    from db import SessionLocal
+    from storage import Candidate, CandidateDocument
+
+    now = time.time()
+    batch_size = 5000
+    with SessionLocal() as session:
+        for start in range(0, len(ids), batch_size):
+            batch = list(enumerate(ids))[start:start + batch_size]
+            session.execute(insert(Candidate), [
+                {"id": cid, "status": STATUSES[i % len(STATUSES)], "created_at": now, "updated_at": now}
+                for i, cid in batch
+            ])
+            session.execute(insert(CandidateDocument), [
+                {"candidate_id": cid, "name": "testoutput.json", "version": 1, "updated_at": now,
+                 "body": orjson.dumps(sample_test_output(i)).decode("utf-8")}
+                for i, cid in batch
+            ])
+            session.commit()
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(backend, operation, samples):
+    print(f"{backend:<11} {operation:<18} n={len(samples):<6} "
+          f"mean={statistics.mean(samples):>10.1f}us  p50={percentile(samples, 50):>10.1f}us  "
+          f"p95={percentile(samples, 95):>10.1f}us  p99={percentile(samples, 99):>10.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--status-counts", type=int, default=5)
+    parser.add_argument("--backends", default="filesystem,sql")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_storage_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from db import init_db
+    from storage import FileSystemStore, SQLStore
+
+    init_db()
+    ids = [str(uuid4()) for _ in range(args.candidates)]
+    lookups = [(random.choice(ids), "testoutput.json") for _ in range(args.lookups)]
+    status_lookups = [(candidate_id,) for candidate_id, _ in lookups]
+
+    try:
+        for backend in args.backends.split(","):
+            if backend == "filesystem":
+                store = FileSystemStore(os.path.join(workdir, "storage"))
+                os.makedirs(store.root)
+                populate = lambda: populate_filesystem(store, ids)
+            else:
+                store = SQLStore()
+                populate = lambda: populate_sql(ids)
+
+            start = time.perf_counter()
+            populate()
+            print(f"{backend:<11} populated {args.candidates} candidates in {time.perf_counter() - start:.1f}s")
+
+            report(backend, "read_document", timed(store.read_document, lookups))
+            report(backend, "document_version", timed(store.document_version, lookups))
+            report(backend, "get_status", timed(store.get_status, status_lookups))
+            report(backend, "count_by_status", timed(store.count_by_status, [("ready",)] * args.status_counts))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
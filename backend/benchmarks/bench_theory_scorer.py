@@ -0,0 +1,63 @@
+# Throughput of the vectorized theory scorer when re-scoring a cohort.
+#
+#   cd backend && python benchmarks/bench_theory_scorer.py --candidates 2000 --questions 5
+#
+# Synthetic answers are scored once as a single cohort batch and once candidate by
+# candidate (what the per-report path does), and the results are checked to match.
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from theory_scorer import cohort_similarities, similarity_scores
+
+WORDS = ("memory reference counting garbage collector cycle thread lock process queue list tuple dict set "
+         "hash mutable immutable generator iterator decorator closure scope class object inheritance method "
+         "interface exception context manager coroutine event loop async await index query transaction").split()
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def build_cohort(candidates: int, questions: int, seed: int):
+    rng = random.Random(seed)
+    expected = [sentence(rng, 60) for _ in range(questions)]
+    return [
+        [{"expected_answer": answer, "submitted_answer": sentence(rng, rng.randint(5, 80))} for answer in expected]
+        for _ in range(candidates)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cohort = build_cohort(args.candidates, args.questions, args.seed)
+    answers = args.candidates * args.questions
+
+    start = time.perf_counter()
+    batched = cohort_similarities(cohort)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [similarity_scores([a["submitted_answer"] for a in candidate], [a["expected_answer"] for a in candidate])
+              for candidate in cohort]
+    single_seconds = time.perf_counter() - start
+
+    assert all(np.allclose(a, b) for a, b in zip(batched, single)), "cohort and per-candidate scores differ"
+    print(f"cohort batch     {answers} answers in {batch_seconds * 1000:8.1f}ms  ({answers / batch_seconds:,.0f} answers/s)")
+    print(f"per candidate    {answers} answers in {single_seconds * 1000:8.1f}ms  ({answers / single_seconds:,.0f} answers/s)")
+
+
+if __name__ == "__main__":
+    main()
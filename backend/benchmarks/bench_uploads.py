@@ -0,0 +1,110 @@
+# Throughput of concurrent multi-MB audio uploads against a live uvicorn server.
+#
+#   cd backend && python benchmarks/bench_uploads.py --uploads 32 --concurrency 8 --size-mb 8
+#
+# While the uploads run, a probe requests "/" every 50ms; its latency shows whether
+# upload handling is blocking the event loop for everyone else.
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from uuid import uuid4
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def start_server(port: int):
+    import uvicorn
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run(args, base_url: str, candidate_id: str):
+    import httpx
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    upload_latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        async def upload(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"/upload_audio/{candidate_id}",
+                                             files={"audio": (f"audio_{i}.mp3", payload, "audio/mpeg")})
+                response.raise_for_status()
+                upload_latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*[upload(i) for i in range(args.uploads)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    total_mb = args.uploads * args.size_mb
+    print(f"{args.uploads} uploads x {args.size_mb} MB, concurrency {args.concurrency}: "
+          f"{elapsed:.2f}s, {total_mb / elapsed:.1f} MB/s, {args.uploads / elapsed:.1f} uploads/s")
+    print(f"upload latency  p50={percentile(upload_latencies, 50):.2f}s  "
+          f"p95={percentile(upload_latencies, 95):.2f}s  max={max(upload_latencies):.2f}s")
+    print(f"probe latency   n={len(probe_latencies)}  mean={statistics.mean(probe_latencies):.1f}ms  "
+          f"p95={percentile(probe_latencies, 95):.1f}ms  max={max(probe_latencies):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    # The app keeps its state relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_uploads_"))
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")  # the LLM is never called here
+    os.environ.setdefault("MAX_AUDIO_BYTES", str((args.size_mb + 1) * 1024 * 1024))
+
+    port = free_port()
+    server, thread = start_server(port)
+    candidate_id = str(uuid4())
+    os.makedirs(os.path.join("storage", candidate_id))
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}", candidate_id))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# Stand-ins for ChatGoogleGenerativeAI used by the benchmarks.
+#
+#   FakeChatModel       deterministic synthetic responses with configurable latency and size
+#   RecordingChatModel  wraps a real model and appends every response to a JSON-lines file
+#   ReplayChatModel     serves recorded responses (with their recorded latency) offline
+#
+# All three plug in where the app builds its client:
+#
+#   import llm
+#   llm.get_llm_object = lambda: FakeChatModel(latency=0.5)
+#
+# or directly with llm.init_chain_registry(model).
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+import typing
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, PrivateAttr
+
+WORDS = ("python data structure algorithm memory thread process queue cache index query design system "
+         "function class object list string number value input output error test case edge").split()
+
+
+def prompt_key(prompt: str, schema: Optional[type] = None) -> str:
+    schema_name = schema.__name__ if schema is not None else "text"
+    return hashlib.sha256(f"{schema_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def _prompt_text(prompt) -> str:
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, list):
+        return get_buffer_string(prompt)
+    return str(prompt)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def build_instance(schema: type, rng: random.Random, items: int, text_words: int):
+    # Fills every field of a pydantic schema with synthetic values; lists get `items` entries
+    values = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if typing.get_origin(annotation) in (list, List):
+            (item_type,) = typing.get_args(annotation)
+            if isinstance(item_type, type) and issubclass(item_type, BaseModel):
+                values[name] = [build_instance(item_type, rng, items, text_words) for _ in range(items)]
+            else:
+                values[name] = [_words(rng, 2) for _ in range(items)]
+        elif annotation is int:
+            values[name] = rng.randint(1, 10)
+        elif annotation is float:
+            values[name] = rng.random()
+        else:
+            values[name] = _words(rng, text_words)
+    return schema(**values)
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    input_tokens, output_tokens = len(prompt) // 4, len(completion) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.5  # mean seconds per call
+    jitter: float = 0.2  # +/- fraction of the latency
+    report_chars: int = 3000  # size of free-text responses
+    items: int = 5  # entries per list in structured responses
+    text_words: int = 12  # words per string field in structured responses
+    stream_chunks: int = 20
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _count(self):
+        with self._lock:
+            self._calls += 1
+
+    def _delay(self, key: str) -> float:
+        rng = random.Random(key)
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    def _text(self, key: str) -> str:
+        rng = random.Random(key)
+        text = _words(rng, self.report_chars // 6)
+        return text[:self.report_chars] + "\nMarks: 0/0"
+
+    # --- Free text (report chain) ---
+
+    def _result(self, prompt: str) -> ChatResult:
+        content = self._text(prompt_key(prompt))
+        message = AIMessage(content=content, usage_metadata=_usage(prompt, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = get_buffer_string(messages)
+        self._count()
+        time.sleep(self._delay(prompt_key(prompt)))
+        return self._result(prompt)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = get_buffer_string(messages)
+        self._count()
+        await asyncio.sleep(self._delay(prompt_key(prompt)))
+        return self._result(prompt)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = get_buffer_string(messages)
+        self._count()
+        content = self._text(prompt_key(prompt))
+        step = max(1, len(content) // self.stream_chunks)
+        pause = self._delay(prompt_key(prompt)) / self.stream_chunks
+        for start in range(0, len(content), step):
+            await asyncio.sleep(pause)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content[start:start + step]))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=_usage(prompt, content)))
+
+    # --- Structured output (skills and question chains) ---
+
+    def structured_response(self, schema: type, prompt: str):
+        return build_instance(schema, random.Random(prompt_key(prompt, schema)), self.items, self.text_words)
+
+    def with_structured_output(self, schema, **kwargs):
+        def invoke(prompt):
+            text = _prompt_text(prompt)
+            self._count()
+            time.sleep(self._delay(prompt_key(text, schema)))
+            return self.structured_response(schema, text)
+
+        async def ainvoke(prompt):
+            text = _prompt_text(prompt)
+            self._count()
+            await asyncio.sleep(self._delay(prompt_key(text, schema)))
+            return self.structured_response(schema, text)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class RecordingChatModel(BaseChatModel):
+    # Passes every call through to `inner` and records the response and its latency
+    inner: BaseChatModel
+    path: str
+
+    _lock: Any = PrivateAttr(default_factory=Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _record(self, key: str, kind: str, response, seconds: float):
+        line = json.dumps({"key": key, "kind": kind, "response": response, "seconds": round(seconds, 4)})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        self._record(prompt_key(get_buffer_string(messages)), "text", message.content, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self._record(prompt_key(get_buffer_string(messages)), "text", message.content, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema, **kwargs):
+        structured = self.inner.with_structured_output(schema, **kwargs)
+
+        async def ainvoke(prompt):
+            start = time.perf_counter()
+            result = await structured.ainvoke(prompt)
+            self._record(prompt_key(_prompt_text(prompt), schema), schema.__name__, result.model_dump(),
+                         time.perf_counter() - start)
+            return result
+
+        def invoke(prompt):
+            return asyncio.run(ainvoke(prompt))
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class ReplayChatModel(FakeChatModel):
+    # Serves responses recorded by RecordingChatModel. Prompts that were never recorded fall back
+    # to synthetic responses, or raise KeyError when `strict` is set.
+    path: str
+    latency_scale: float = 1.0
+    strict: bool = False
+
+    _recorded: Dict[str, dict] = PrivateAttr(default_factory=dict)
+    _misses: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._recorded[record["key"]] = record
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        record = self._recorded.get(key)
+        if record is None:
+            if self.strict:
+                raise KeyError(f"No recorded response for prompt {key[:12]}")
+            with self._lock:
+                self._misses += 1
+        return record
+
+    def _delay(self, key: str) -> float:
+        record = self._recorded.get(key)
+        return record["seconds"] * self.latency_scale if record else super()._delay(key)
+
+    def _text(self, key: str) -> str:
+        record = self._lookup(key)
+        return record["response"] if record else super()._text(key)
+
+    def structured_response(self, schema: type, prompt: str):
+        record = self._lookup(prompt_key(prompt, schema))
+        return schema.model_validate(record["response"]) if record else super().structured_response(schema, prompt)
@@ -0,0 +1,304 @@
+import asyncio
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits are then only enforced by the timeout
+    resource = None
+
+GRADER_WORKERS = int(os.environ.get("GRADER_WORKERS", min(8, (os.cpu_count() or 1) * 2)))
+GRADER_TIME_LIMIT_SECONDS = float(os.environ.get("GRADER_TIME_LIMIT_SECONDS", 5))
+GRADER_MEMORY_LIMIT_MB = int(os.environ.get("GRADER_MEMORY_LIMIT_MB", 256))
+GRADER_OUTPUT_LIMIT_BYTES = int(os.environ.get("GRADER_OUTPUT_LIMIT_BYTES", 64 * 1024))
+# Submitted code only runs inside a sandbox: "auto" picks bubblewrap or nsjail, whichever is
+# installed. "none" runs it unconfined and is only meant for trusted local development.
+GRADER_SANDBOX = os.environ.get("GRADER_SANDBOX", "auto").lower()
+GRADER_SANDBOX_UID = int(os.environ.get("GRADER_SANDBOX_UID", 65534))
+
+# Mounted read-only in the sandbox, everything else of the host filesystem is hidden
+SANDBOX_READONLY_PATHS = tuple(dict.fromkeys(("/usr", "/lib", "/lib64", "/bin", sys.base_prefix, sys.prefix)))
+# The only writable path, holding the solution
+SANDBOX_DIR = "/sandbox"
+
+GRADED_LANGUAGES = {"python", "python3", "py"}
+
+PASSED = "passed"
+WRONG_ANSWER = "wrong_answer"
+RUNTIME_ERROR = "runtime_error"
+TIME_LIMIT_EXCEEDED = "time_limit_exceeded"
+MEMORY_LIMIT_EXCEEDED = "memory_limit_exceeded"
+OUTPUT_LIMIT_EXCEEDED = "output_limit_exceeded"
+
+# Failed tests listed in the report summary, per question
+SUMMARY_FAILED_TESTS = 3
+SUMMARY_TEXT_CHARS = 200
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def get_grader_executor() -> ThreadPoolExecutor:
+    # Each test runs in its own subprocess; these threads only supervise them, so the
+    # pool size is the number of solutions executing at the same time
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GRADER_WORKERS, thread_name_prefix="grader")
+    return _executor
+
+
+def shutdown_grader_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+# Sets the limits and then becomes the solution, so they apply to it and to nothing else.
+# argv: memory bytes, CPU seconds, output bytes, solution path
+LIMITS_WRAPPER = """
+import os, resource, sys
+
+def limit(name, value):
+    hard = resource.getrlimit(name)[1]
+    value = value if hard == resource.RLIM_INFINITY else min(value, hard)
+    resource.setrlimit(name, (value, value))
+
+memory, cpu, output = map(int, sys.argv[1:4])
+limit(resource.RLIMIT_AS, memory)
+limit(resource.RLIMIT_CPU, cpu)
+# stdout/stderr go to files, so this also caps how much output a solution can produce
+limit(resource.RLIMIT_FSIZE, output)
+limit(resource.RLIMIT_NOFILE, 64)
+limit(resource.RLIMIT_NPROC, 0)  # No forking (not enforced for root)
+limit(resource.RLIMIT_CORE, 0)
+os.execv(sys.executable, [sys.executable, "-I", sys.argv[4]])
+"""
+
+
+@lru_cache(maxsize=None)
+def sandbox_tool() -> Optional[str]:
+    # None when no sandbox is available, solutions are then left ungraded
+    if GRADER_SANDBOX == "none":
+        return "none"
+    for tool in (("bwrap", "nsjail") if GRADER_SANDBOX == "auto" else (GRADER_SANDBOX,)):
+        if shutil.which(tool):
+            return tool
+    return None
+
+
+def _readonly_mounts(tool: str) -> List[str]:
+    args = []
+    for path in SANDBOX_READONLY_PATHS:
+        if os.path.islink(path):
+            # /bin and /lib are usually links into /usr
+            target = os.readlink(path)
+            args += ["--symlink", target, path] if tool == "bwrap" else ["--symlink", f"{target}:{path}"]
+        elif os.path.exists(path):
+            args += ["--ro-bind", path, path] if tool == "bwrap" else ["-R", path]
+    return args
+
+
+def sandbox_command(tool: str, box: str, command: List[str]) -> List[str]:
+    # A separate unprivileged uid in its own namespaces: no network, no host processes, a
+    # read-only view of the interpreter and system libraries and `box` as the only writable path
+    uid = str(GRADER_SANDBOX_UID)
+    if tool == "bwrap":
+        return ["bwrap", "--unshare-all", "--die-with-parent", "--new-session", "--uid", uid, "--gid", uid,
+                *_readonly_mounts(tool), "--dev", "/dev", "--proc", "/proc",
+                "--bind", box, SANDBOX_DIR, "--chdir", SANDBOX_DIR, "--", *command]
+    if tool == "nsjail":
+        return ["nsjail", "--mode", "o", "--quiet", "--keep_env", "--user", uid, "--group", uid,
+                "--time_limit", str(math.ceil(GRADER_TIME_LIMIT_SECONDS) + 2),
+                *_readonly_mounts(tool), "-B", f"{box}:{SANDBOX_DIR}", "--cwd", SANDBOX_DIR,
+                "--", *command]
+    return command
+
+
+def _solution_command(solution_path: str) -> List[str]:
+    if resource is None:
+        return [sys.executable, "-I", solution_path]
+    memory = GRADER_MEMORY_LIMIT_MB * 1024 * 1024
+    cpu = math.ceil(GRADER_TIME_LIMIT_SECONDS) + 1
+    return [sys.executable, "-I", "-c", LIMITS_WRAPPER, str(memory), str(cpu), str(GRADER_OUTPUT_LIMIT_BYTES),
+            solution_path]
+
+
+def _signal(returncode: int, sandboxed: bool) -> Optional[int]:
+    # The sandbox tools report a solution killed by a signal as 128 + the signal number
+    if returncode < 0:
+        return -returncode
+    if sandboxed and returncode > 128:
+        return returncode - 128
+    return None
+
+
+def _kill_group(process: subprocess.Popen):
+    if os.name != "posix":
+        process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def normalize_output(text: str) -> str:
+    # Trailing whitespace and blank lines are not significant
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _read_limited(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read(GRADER_OUTPUT_LIMIT_BYTES).decode("utf-8", errors="replace")
+
+
+def run_test_case(code: str, test_case: dict, tool: str = "none") -> dict:
+    # Runs one solution against one test case in `tool`'s sandbox, from a fresh directory holding
+    # only the solution, with an isolated interpreter (-I: no user site, no PYTHON* env vars, no
+    # cwd on sys.path). Its output is collected outside that directory.
+    sandboxed = tool != "none"
+    with tempfile.TemporaryDirectory(prefix="grader_") as workdir:
+        box = os.path.join(workdir, "box")
+        os.mkdir(box)
+        with open(os.path.join(box, "solution.py"), "w", encoding="utf-8") as f:
+            f.write(code)
+        stdout_path = os.path.join(workdir, "stdout")
+        stderr_path = os.path.join(workdir, "stderr")
+        solution_path = os.path.join(SANDBOX_DIR if sandboxed else box, "solution.py")
+
+        with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+            start = time.perf_counter()
+            # Its own process group, so everything the solution starts is killed with it
+            process = subprocess.Popen(
+                sandbox_command(tool, box, _solution_command(solution_path)),
+                stdin=subprocess.PIPE, stdout=stdout, stderr=stderr, cwd=box,
+                env={"PATH": os.defpath, "PYTHONIOENCODING": "utf-8"},
+                process_group=0 if os.name == "posix" else None,
+            )
+            try:
+                process.communicate(input=str(test_case.get("input", "")).encode("utf-8"),
+                                    timeout=GRADER_TIME_LIMIT_SECONDS)
+                timed_out = False
+            except subprocess.TimeoutExpired:
+                _kill_group(process)
+                process.wait()
+                timed_out = True
+            except BrokenPipeError:
+                # Solution exited without reading its input
+                process.wait()
+                timed_out = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # Clean up anything the solution left running in its process group
+            _kill_group(process)
+
+        output_truncated = os.path.getsize(stdout_path) >= GRADER_OUTPUT_LIMIT_BYTES
+        output = _read_limited(stdout_path)
+        error = _read_limited(stderr_path)
+
+    expected = str(test_case.get("expected_output", ""))
+    returncode = process.returncode
+    killed_by = _signal(returncode, sandboxed)
+    if timed_out or killed_by in (signal.SIGXCPU, signal.SIGKILL):
+        status = TIME_LIMIT_EXCEEDED
+    elif output_truncated or killed_by == signal.SIGXFSZ:
+        status = OUTPUT_LIMIT_EXCEEDED
+    elif returncode != 0:
+        status = MEMORY_LIMIT_EXCEEDED if "MemoryError" in error else RUNTIME_ERROR
+    elif normalize_output(output) == normalize_output(expected):
+        status = PASSED
+    else:
+        status = WRONG_ANSWER
+
+    return {
+        "input": test_case.get("input", ""),
+        "expected_output": expected,
+        "output": output,
+        "error": error.strip().splitlines()[-1] if error.strip() else "",
+        "status": status,
+        "passed": status == PASSED,
+        "time_ms": round(elapsed_ms, 1),
+    }
+
+
+async def grade_solution(code: str, language: str, test_cases: List[dict]) -> dict:
+    if language.strip().lower() not in GRADED_LANGUAGES:
+        return {"graded": False, "reason": f"Automatic grading is not available for {language}.",
+                "passed": 0, "total": len(test_cases), "tests": []}
+    if not code.strip():
+        return {"graded": True, "reason": "No code submitted.", "passed": 0, "total": len(test_cases),
+                "tests": []}
+    tool = sandbox_tool()
+    if tool is None:
+        return {"graded": False, "reason": f"No code sandbox ({GRADER_SANDBOX}) is available to run the solution.",
+                "passed": 0, "total": len(test_cases), "tests": []}
+
+    loop = asyncio.get_running_loop()
+    executor = get_grader_executor()
+    start = time.perf_counter()
+    tests = await asyncio.gather(*[
+        loop.run_in_executor(executor, run_test_case, code, test_case, tool) for test_case in test_cases
+    ])
+    return {
+        "graded": True,
+        "passed": sum(test["passed"] for test in tests),
+        "total": len(tests),
+        "time_ms": round((time.perf_counter() - start) * 1000, 1),
+        "tests": tests,
+    }
+
+
+async def grade_coding_answers(coding_answers: List[dict], coding_questions: List[dict]) -> List[dict]:
+    # Matches each answer to its generated question by name; all solutions are graded concurrently
+    questions = {question["name"]: question for question in coding_questions}
+
+    async def grade(answer):
+        question = questions.get(answer["question_name"])
+        if question is None:
+            result = {"graded": False, "reason": "Question not found.", "passed": 0, "total": 0, "tests": []}
+        else:
+            result = await grade_solution(answer["submitted_code"], answer["language"], question["test_cases"])
+        return {"question_name": answer["question_name"], "language": answer["language"], **result}
+
+    return list(await asyncio.gather(*[grade(answer) for answer in coding_answers]))
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= SUMMARY_TEXT_CHARS else text[:SUMMARY_TEXT_CHARS] + "..."
+
+
+def summarize_coding_results(results: List[dict]) -> List[dict]:
+    # What the report prompt sees instead of the raw code
+    summary = []
+    for result in results:
+        item = {
+            "question_name": result["question_name"],
+            "language": result["language"],
+            "tests_passed": f"{result['passed']}/{result['total']}",
+        }
+        if not result["graded"] or "reason" in result:
+            item["note"] = result.get("reason", "")
+        failed = [test for test in result["tests"] if not test["passed"]]
+        if failed:
+            item["failed_tests"] = [
+                {"input": _clip(test["input"]), "expected_output": _clip(test["expected_output"]),
+                 "status": test["status"],
+                 "output": _clip(test["error"] if test["status"] == RUNTIME_ERROR else test["output"])}
+                for test in failed[:SUMMARY_FAILED_TESTS]
+            ]
+        summary.append(item)
+    return summary
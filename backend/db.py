@@ -0,0 +1,39 @@
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///storage/app.db")
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def _create_engine(url: str):
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True)
+
+    database = url.split(":///", 1)[-1]
+    if database and database != ":memory:":
+        os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+
+    sqlite_engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets the API read while workers write
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return sqlite_engine
+
+
+engine = _create_engine(DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def init_db():
+    Base.metadata.create_all(engine)
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+from typing import Optional
+
+import orjson
+import zstandard
+
+# Bodies smaller than this are sent as-is, compressing them saves less than the headers cost
+BUNDLE_MIN_COMPRESS_BYTES = int(os.environ.get("BUNDLE_MIN_COMPRESS_BYTES", 1024))
+BUNDLE_GZIP_LEVEL = int(os.environ.get("BUNDLE_GZIP_LEVEL", 6))
+BUNDLE_ZSTD_LEVEL = int(os.environ.get("BUNDLE_ZSTD_LEVEL", 3))
+
+IDENTITY = "identity"
+# Preferred first when the client accepts several with the same weight
+SUPPORTED_ENCODINGS = ("zstd", "gzip")
+
+# Fields a candidate may see, per testoutput.json section. Listed rather than filtered out, so
+# answers, expected answers and hidden test cases never leak, including fields added later.
+CANDIDATE_FIELDS = {
+    "questions": ("question", "options"),
+    "therotical_questions": ("question",),
+    "coding_question": ("name", "description", "example"),
+}
+
+
+# --- Candidate View ---
+
+def candidate_exam_view(candidate_id: str, data: dict, sections: dict) -> dict:
+    # `sections` maps exam section names onto their testoutput.json keys
+    view = {"candidate_id": candidate_id, "level": data.get("level"), "sections": {}, "pending": []}
+    for section, key in sections.items():
+        if key not in data:
+            view["pending"].append(section)
+            continue
+        view["sections"][section] = candidate_questions(key, data[key])
+    return view
+
+
+def candidate_questions(key: str, questions: list) -> list:
+    fields = CANDIDATE_FIELDS[key]
+    return [{field: question.get(field) for field in fields} for question in questions]
+
+
+def encode_bundle(view: dict) -> bytes:
+    return orjson.dumps(view)
+
+
+# --- Conditional Requests ---
+
+def bundle_etag(body: bytes, encoding: str) -> str:
+    # Strong validator of the exact bytes sent: each content coding is its own representation
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f'"{digest}"' if encoding == IDENTITY else f'"{digest}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison; proxies that recompress turn strong tags into weak ones
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+# --- Content Coding ---
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding] = weight
+
+    best, best_weight = IDENTITY, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def choose_encoding(accept_encoding: Optional[str], size: int) -> str:
+    if not accept_encoding or size < BUNDLE_MIN_COMPRESS_BYTES:
+        return IDENTITY
+    return negotiate_encoding(accept_encoding)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=BUNDLE_ZSTD_LEVEL).compress(body)
+    if encoding == "gzip":
+        # mtime=0 so the same bundle always compresses to the same bytes, as its strong ETag promises
+        return gzip.compress(body, compresslevel=BUNDLE_GZIP_LEVEL, mtime=0)
+    return body
+
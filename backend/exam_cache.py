@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class _Entry:
+    __slots__ = ("data", "version", "size", "checked_at")
+
+    def __init__(self, data, version, size, checked_at):
+        self.data = data
+        self.version = version
+        self.size = size
+        self.checked_at = checked_at
+
+
+class ExamCache:
+    # Per-process LRU of parsed exam documents, bounded by the serialized size of the entries.
+    # An entry is trusted for `revalidate_seconds`, then its storage version is compared once
+    # so writes made by other worker processes are still picked up.
+    # Cached documents are shared between requests and must be treated as read-only.
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, revalidate_seconds: float = 2.0):
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, key: str, current_version):
+        # `current_version()` is only called when an entry is due for revalidation, and without the
+        # lock: it is storage I/O, and other keys' lookups must not queue behind it
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry.checked_at < self.revalidate_seconds:
+                return self._result(key, entry)
+        version = current_version()
+        with self._lock:
+            # A put may have replaced the entry meanwhile; the new one is fresh already
+            if self._entries.get(key) is entry:
+                if version == entry.version:
+                    entry.checked_at = now
+                else:
+                    self._remove(key)
+            return self._result(key, self._entries.get(key))
+
+    def _result(self, key: str, entry):
+        # Called with the lock held
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.data
+
+    def put(self, key: str, data, version, size: int):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = _Entry(data, version, size, time.monotonic())
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        self._size -= self._entries.pop(key).size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+from threading import Lock
+from typing import Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import Float, String, Text, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, SessionLocal
+from scoring import SECTIONS, section_config
+
+# --- Analysis States ---
+
+ANALYSIS_PENDING = "pending"
+ANALYSIS_READY = "ready"
+ANALYSIS_FAILED = "failed"
+
+# JD fields the skill-extraction prompt gets instead of the raw requirements
+PROMPT_FIELDS = ("role", "mandatory_skills", "important_skills", "summary")
+
+
+class ExamTemplate(Base):
+    # A job description registered once and shared by every candidate applying to it
+    __tablename__ = "exam_templates"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True)
+    job_description: Mapped[str] = mapped_column(Text)
+    analysis: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    analysis_status: Mapped[str] = mapped_column(String(16), default=ANALYSIS_PENDING)
+    analysis_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[float] = mapped_column(Float)
+
+    def to_dict(self) -> dict:
+        return {
+            "template_id": self.id,
+            "job_description": json.loads(self.job_description),
+            "analysis_status": self.analysis_status,
+            "analysis": json.loads(self.analysis) if self.analysis else None,
+            "analysis_error": self.analysis_error,
+            "created_at": self.created_at,
+        }
+
+
+def template_hash(job_description: dict) -> str:
+    canonical = json.dumps(job_description, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# --- Template Table Access ---
+
+def register_template(job_description: dict) -> Tuple[ExamTemplate, bool]:
+    # Registering the same JD again returns the existing template; the flag tells if it is new
+    content_hash = template_hash(job_description)
+    with SessionLocal() as session:
+        existing = session.scalars(select(ExamTemplate).where(ExamTemplate.content_hash == content_hash)).first()
+        if existing is not None:
+            return existing, False
+        now = time.time()
+        template = ExamTemplate(id=str(uuid4()), content_hash=content_hash, job_description=json.dumps(job_description),
+                                analysis_status=ANALYSIS_PENDING, created_at=now, updated_at=now)
+        session.add(template)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Registered concurrently by another request
+            session.rollback()
+            return session.scalars(select(ExamTemplate).where(ExamTemplate.content_hash == content_hash)).one(), False
+    return template, True
+
+
+def get_template(template_id: str) -> Optional[ExamTemplate]:
+    with SessionLocal() as session:
+        return session.get(ExamTemplate, template_id)
+
+
+def save_template_analysis(template_id: str, analysis: dict):
+    with SessionLocal() as session:
+        session.execute(
+            update(ExamTemplate)
+            .where(ExamTemplate.id == template_id)
+            .values(analysis=json.dumps(analysis), analysis_status=ANALYSIS_READY, analysis_error=None,
+                    updated_at=time.time())
+        )
+        session.commit()
+
+
+def mark_template_analysis_failed(template_id: str, error: str):
+    with SessionLocal() as session:
+        session.execute(
+            update(ExamTemplate)
+            .where(ExamTemplate.id == template_id, ExamTemplate.analysis_status != ANALYSIS_READY)
+            .values(analysis_status=ANALYSIS_FAILED, analysis_error=error, updated_at=time.time())
+        )
+        session.commit()
+
+
+# --- Cached Lookups ---
+
+# The job description never changes after registration and the analysis once it is ready, so
+# both are cached for the life of the process. Cached dicts are shared and must not be mutated.
+_job_descriptions = {}
+_analyses = {}
+_cache_lock = Lock()
+
+
+def load_template_job_description(template_id: str) -> Optional[dict]:
+    job_description = _job_descriptions.get(template_id)
+    if job_description is None:
+        template = get_template(template_id)
+        if template is None:
+            return None
+        job_description = json.loads(template.job_description)
+        with _cache_lock:
+            _job_descriptions[template_id] = job_description
+    return job_description
+
+
+def load_template_analysis(template_id: str) -> Optional[dict]:
+    analysis = _analyses.get(template_id)
+    if analysis is None:
+        template = get_template(template_id)
+        if template is None or template.analysis_status != ANALYSIS_READY:
+            return None
+        analysis = json.loads(template.analysis)
+        with _cache_lock:
+            _analyses[template_id] = analysis
+    return analysis
+
+
+# --- Prompt Inputs ---
+
+def build_template_analysis(job_description: dict, jd_analysis: dict) -> dict:
+    # The LLM's reading of the requirements plus the exam settings the examiner gave
+    test_details = job_description.get("test_details", {})
+    return {
+        **jd_analysis,
+        "difficulty_level": job_description.get("difficulty_level"),
+        "sections": {section: section_config(test_details, section, 0) for section in SECTIONS},
+    }
+
+
+def skills_prompt_job_description(analysis: dict) -> str:
+    return json.dumps({field: analysis[field] for field in PROMPT_FIELDS if field in analysis},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def exam_prompt_details(job_description: dict) -> dict:
+    # Question generation works from the extracted skills; the requirements text adds nothing there
+    return {key: value for key, value in job_description.items() if key != "requirements"}
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Float, Integer, String, Text, or_, and_, select, update
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# --- Job States ---
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    candidate_id: Mapped[str] = mapped_column(String(36), index=True)
+    folder_path: Mapped[str] = mapped_column(String(512))
+    status: Mapped[str] = mapped_column(String(16), index=True, default=QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_run_at: Mapped[float] = mapped_column(Float, index=True)
+    lease_expires_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    created_at: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[float] = mapped_column(Float)
+    finished_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "candidate_id": self.candidate_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "last_error": self.last_error,
+            "next_run_at": self.next_run_at,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# --- Job Table Access ---
+
+def create_job(candidate_id: str, folder_path: str, max_attempts: int) -> GenerationJob:
+    return create_jobs([(candidate_id, folder_path)], max_attempts)[0]
+
+
+def create_jobs(entries: List[Tuple[str, str]], max_attempts: int) -> List[GenerationJob]:
+    # One transaction for a whole batch of (candidate_id, folder_path) entries
+    now = time.time()
+    jobs = [
+        GenerationJob(
+            id=str(uuid4()),
+            candidate_id=candidate_id,
+            folder_path=folder_path,
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max_attempts,
+            next_run_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+        for candidate_id, folder_path in entries
+    ]
+    with SessionLocal() as session:
+        session.add_all(jobs)
+        session.commit()
+    return jobs
+
+
+def get_latest_job(candidate_id: str) -> Optional[GenerationJob]:
+    with SessionLocal() as session:
+        return session.scalars(
+            select(GenerationJob)
+            .where(GenerationJob.candidate_id == candidate_id)
+            .order_by(GenerationJob.created_at.desc())
+            .limit(1)
+        ).first()
+
+
+def get_latest_jobs(candidate_ids: List[str]) -> Dict[str, GenerationJob]:
+    latest = {}
+    with SessionLocal() as session:
+        for start in range(0, len(candidate_ids), 500):
+            jobs = session.scalars(
+                select(GenerationJob)
+                .where(GenerationJob.candidate_id.in_(candidate_ids[start:start + 500]))
+                .order_by(GenerationJob.created_at)
+            )
+            for job in jobs:
+                latest[job.candidate_id] = job
+    return latest
+
+
+def claim_next_job(lease_seconds: float) -> Optional[GenerationJob]:
+    # Due queued jobs, or running jobs whose worker died and let the lease lapse
+    now = time.time()
+    claimable = or_(
+        and_(GenerationJob.status == QUEUED, GenerationJob.next_run_at <= now),
+        and_(GenerationJob.status == RUNNING, GenerationJob.lease_expires_at < now),
+    )
+    with SessionLocal() as session:
+        candidates = session.scalars(
+            select(GenerationJob).where(claimable).order_by(GenerationJob.next_run_at).limit(8)
+        ).all()
+        for job in candidates:
+            # Compare-and-set on the state we read, so two workers never claim the same job
+            claimed = session.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id, GenerationJob.status == job.status,
+                       GenerationJob.updated_at == job.updated_at)
+                .values(status=RUNNING, attempts=job.attempts + 1,
+                        lease_expires_at=now + lease_seconds, updated_at=now)
+            ).rowcount
+            session.commit()
+            if claimed:
+                session.refresh(job)
+                return job
+    return None
+
+
+def renew_lease(job: GenerationJob, lease_seconds: float) -> bool:
+    # False when the job is no longer this worker's: its lease lapsed and another worker claimed it
+    now = time.time()
+    with SessionLocal() as session:
+        renewed = session.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job.id, GenerationJob.status == RUNNING,
+                   GenerationJob.attempts == job.attempts)
+            .values(lease_expires_at=now + lease_seconds, updated_at=now)
+        ).rowcount
+        session.commit()
+    return bool(renewed)
+
+
+def mark_job_succeeded(job_id: str):
+    now = time.time()
+    with SessionLocal() as session:
+        session.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id)
+            .values(status=SUCCEEDED, last_error=None, lease_expires_at=None, updated_at=now, finished_at=now)
+        )
+        session.commit()
+
+
+def mark_job_failed(job: GenerationJob, error: str, backoff_seconds: float, retry: bool = True) -> str:
+    now = time.time()
+    if retry and job.attempts < job.max_attempts:
+        # Exponential backoff with jitter so failed jobs don't retry in lockstep
+        delay = backoff_seconds * (2 ** (job.attempts - 1)) * random.uniform(0.5, 1.5)
+        values = dict(status=QUEUED, next_run_at=now + delay)
+    else:
+        values = dict(status=FAILED, finished_at=now)
+    with SessionLocal() as session:
+        session.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job.id)
+            .values(last_error=error, lease_expires_at=None, updated_at=now, **values)
+        )
+        session.commit()
+    return values["status"]
+
+
+def requeue_job(job_id: str):
+    with SessionLocal() as session:
+        session.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status == RUNNING)
+            .values(status=QUEUED, lease_expires_at=None, next_run_at=time.time(), updated_at=time.time())
+        )
+        session.commit()
+
+
+# --- Worker Pool ---
+
+class GenerationWorkerPool:
+    # A fixed number of workers pull jobs from the persisted table and run `handler(folder_path)`.
+    # `on_finished(candidate_id, status)` is called with the job's new status after every attempt.
+    # Exceptions listed in `permanent_errors` fail the job without further retries.
+
+    def __init__(self, handler, on_finished=None, permanent_errors=(), concurrency: int = 4, max_attempts: int = 3,
+                 backoff_seconds: float = 5.0, lease_seconds: float = 900.0, poll_interval: float = 2.0):
+        self.handler = handler
+        self.on_finished = on_finished
+        self.permanent_errors = permanent_errors
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self._stopping = False
+
+    async def enqueue(self, candidate_id: str, folder_path: str) -> GenerationJob:
+        job = await run_in_threadpool(create_job, candidate_id, folder_path, self.max_attempts)
+        self._wakeup.set()
+        return job
+
+    async def enqueue_many(self, entries: List[Tuple[str, str]]) -> List[GenerationJob]:
+        # Workers still take them `concurrency` at a time
+        jobs = await run_in_threadpool(create_jobs, entries, self.max_attempts)
+        self._wakeup.set()
+        return jobs
+
+    def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        # A cancellation that lands as a run_in_threadpool call completes can be swallowed by
+        # anyio's shielded thread wait, so workers also check the flag before taking more work
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                job = await run_in_threadpool(claim_next_job, self.lease_seconds)
+            except Exception:
+                logger.exception("Failed to claim generation job")
+                job = None
+            if job is None:
+                await self._wait_for_work()
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                # Recording the outcome failed (e.g. the database is locked); the job is retried
+                # once its lease lapses, and this worker keeps serving the queue
+                logger.exception("Failed to record the outcome of generation job %s for candidate %s",
+                                 job.id, job.candidate_id)
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _renew_lease(self, job: GenerationJob):
+        # Heartbeat for runs longer than the lease, so no other worker claims the job meanwhile
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await run_in_threadpool(renew_lease, job, self.lease_seconds):
+                    logger.warning("Generation job %s lost its lease while running", job.id)
+                    return
+            except Exception:
+                logger.exception("Failed to renew the lease of generation job %s", job.id)
+
+    async def _run(self, job: GenerationJob):
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+        try:
+            await self.handler(job.folder_path)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting for its lease to expire
+            await asyncio.shield(run_in_threadpool(requeue_job, job.id))
+            raise
+        except Exception as e:
+            logger.exception("Generation job %s for candidate %s failed (attempt %d/%d)",
+                             job.id, job.candidate_id, job.attempts, job.max_attempts)
+            status = await run_in_threadpool(mark_job_failed, job, f"{type(e).__name__}: {e}", self.backoff_seconds,
+                                             not isinstance(e, self.permanent_errors))
+        else:
+            await run_in_threadpool(mark_job_succeeded, job.id)
+            status = SUCCEEDED
+        finally:
+            heartbeat.cancel()
+        if self.on_finished is not None:
+            await self.on_finished(job.candidate_id, status)
@@ -0,0 +1,316 @@
+import math
+import os
+from threading import Lock
+from typing import List
+
+from langchain_google_genai import ChatGoogleGenerativeAI, chat_models as genai_chat_models
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables.base import RunnableSequence
+from pydantic import BaseModel, Field
+from tenacity import retry, stop_after_attempt
+
+from llm_scheduler import PRIORITY_GENERATION, PRIORITY_REPORT, LLMScheduler, ScheduledChain
+from metrics import LLMMetricsCallback
+from report_input import CHARS_PER_TOKEN
+
+
+# --- Output Schemas ---
+
+class Skills(BaseModel):
+    mandatory_skills: List[str] = Field(description="List of mandatory skills.")
+    important_skills: List[str] = Field(description="List of important skills.")
+    unnecessary_skills: List[str] = Field(description="List of unnecessary skills.")
+
+
+class Profile(BaseModel):
+    name: str = Field(description="The name of candidate.")
+    qualification: str = Field(description="Highest qualification of a candidate.")
+    technical_skills: List[str] = Field(description="Technical skills of a candidate.")
+    soft_skills: List[str] = Field(description="Soft skills of a candidate.")
+    programming_languages: List[str] = Field(description="Programming Languages that candidate knows.")
+    email: str = Field(description="EmailId of a candidate.")
+    contact_no: str = Field(description="Contact Number of a candidate.")
+    skills_in_jd: List[str] = Field(description="skills required as per JD.")
+    exam_skills: List[Skills] = Field(description="Skills obtained for Examination.")
+
+
+class JobAnalysis(BaseModel):
+    role: str = Field(description="The job title or role.")
+    mandatory_skills: List[str] = Field(description="Skills the job description requires.")
+    important_skills: List[str] = Field(description="Skills the job description values but does not require.")
+    summary: str = Field(description="Two or three sentences on the responsibilities of the role.")
+
+
+class MCQ(BaseModel):
+    question: str = Field(description="The multiple choice question.")
+    options: List[str] = Field(description="List of four options for the question.")
+    answer: str = Field(description="The correct option for the question.")
+
+
+class TestCase(BaseModel):
+    input: str = Field(description="The exact text fed to the program on standard input, one value or line per "
+                                   "line as the description specifies; raw values only, no variable names or labels.")
+    expected_output: str = Field(description="The exact text the program prints to standard output for this input, "
+                                             "nothing else; no labels or explanations.")
+    description: str = Field(description="The description for the program.")
+
+
+class CodingQuestion(BaseModel):
+    name: str = Field(description="The coding question name.")
+    description: str = Field(description="The coding question description, including the exact standard input "
+                                         "and standard output formats.")
+    # hints: List[str] = Field(description="hints is required for the question.")
+    example: List[TestCase] = Field(description="List of examples.")
+    test_cases: List[TestCase] = Field(description="List of all the corner case test cases.")
+
+
+class TheroticalQuestions(BaseModel):
+    question: str = Field(description="The Therotical question.")
+    expected_answer: str = Field(description="The Answer for the question.")
+
+
+class MCQSection(BaseModel):
+    level: str = Field(description="The difficulty level of the questions.")
+    questions: List[MCQ] = Field(description="List of MCQs generated.")
+
+
+class TheorySection(BaseModel):
+    therotical_questions: List[TheroticalQuestions] = Field(description="List of Therotical questions generated.")
+
+
+class CodingSection(BaseModel):
+    coding_question: List[CodingQuestion] = Field(description="List of Coding Questions generated.")
+
+
+# --- Prompt Templates ---
+
+SKILLS_TEMPLATE = """
+    You are an expert examiner.
+    Here is the resume text: {text} and Job Description: {job_desc}
+    Filter out Skills that needs to be tested for an interview of a candidate in three sections
+    Mandatory skills, important skills, unnecessary skills
+    Mandatory contains as per name mandatory skills according to Job Description.
+    Important contains skills that can be tested for overall candidate knowledge.
+    Unnecessary contains unrelated skills to Job Description.
+    Get all these in Exam Skills and also get some more profile details as per requirement
+    """
+
+JD_ANALYSIS_TEMPLATE = """
+    You are an expert examiner.
+    Here is the Job Description: {job_desc}
+    Identify the role, the mandatory skills it requires and the important skills that are valued but not required.
+    Summarize the responsibilities of the role in two or three sentences.
+    Keep skill names short, one skill per entry.
+    """
+
+EXAM_HEADER = """
+    You are an expert exam creator.
+
+    ### Skills Overview:
+    {skills}
+
+    ### Skill Prioritization:
+    - **mandatory_skills** (High priority, 60% weightage)
+    - **important_skills** (Medium priority, 40% weightage)
+    - **unnecessary_skills** (Ignored)
+
+    ### Test Overview:
+    Test Details: {test_details}
+    Experience Level & Difficulty: test_details.difficulty_level
+
+    ### Exam Section:
+    """
+
+MCQ_TEMPLATE = EXAM_HEADER + """
+    MCQs
+    - Create test_details['test_details']['MCQ']['no_of_questions'] MCQs.
+    - Difficulty must **strictly** align with the specified test_details.difficulty_level. Use the following mapping:
+    - Beginner → basic conceptual MCQs
+    - Intermediate → practical understanding
+    - Advanced → debugging, tricky scenarios
+    - Expert → integration and real-world architecture
+    - Master → advanced scenarios, optimization, pitfalls
+    - Focus: primarily on **mandatory_skills** (70%), some on **important_skills** (30%), ignore **unnecessary_skills**.
+    - Each MCQ:
+    - Technically correct, unambiguous
+    - **Exactly 1 correct answer**
+    - Include **corner case** coverage where relevant
+    """
+
+THEORY_TEMPLATE = EXAM_HEADER + """
+    Theory Questions
+    - Generate test_details['test_details']['Theory']['no_of_questions'] theory questions.
+    - Each answer should require **4-5 lines**.
+    - **Difficulty strictly aligned** with test_details.difficulty_level:
+    - Beginner → basic definitions
+    - Intermediate → explain how it works
+    - Advanced → comparisons, pros/cons
+    - Expert → architectural decisions
+    - Master → advanced pitfalls, security, performance
+    - Focus on **why/how**, testing deeper conceptual understanding.
+    """
+
+CODING_TEMPLATE = EXAM_HEADER + """
+    **Coding Problems**
+    - Generate test_details['test_details']['Coding']['no_of_questions'] logical coding problems for difficulty level test_details.difficulty_level.
+    - Each question **must**:
+        - Be fully testable with clear **input → output → explanation**.
+        - Be solved as a complete program that reads its input from **standard input** and prints its answer to **standard output**; solutions are graded by running them on the test cases.
+        - State the exact input format (what each line holds) and the exact output format in the Description.
+        - **Avoid** using external dependencies like databases, files, APIs, or frameworks.
+        - Test core skills: data structures, algorithms, problem-solving, recursion, loops, string manipulation, number theory, etc.
+    - Clearly define:
+        - **Name**
+        - **Description** with detailed constraints
+        - **Examples** (at least 2)
+        - **Test Cases** (with diverse inputs including edge cases)
+    - For every example and test case, `input` is passed **verbatim** to standard input and `expected_output` must **exactly** match what a correct program prints:
+        - Raw values in the stated format only, lines separated by newlines; no `x = ...` assignments, labels, quotes or function calls
+        - `expected_output` holds nothing but the printed result, any explanation belongs in the test case description
+    - Ensure **different coding problems for different experience levels**:
+        - Beginner → Simple operations, loops, or conditionals
+        - Intermediate → String manipulation, arrays
+        - Advanced → Recursion, algorithmic thinking
+        - Expert → Optimization, complex data structures
+        - Master → Algorithm design with multiple edge cases, large input constraints
+    """
+
+REPORT_TEMPLATE = """
+    You are an expert examiner.
+    Here is the Json output of answers submitted by candidate:
+    {final_data}
+    The marks have already been calculated and are final, use them exactly as given:
+    {scores}
+    Based on the following Data Generate a Report of the candidate in the below format without formatting
+    Candidate Name:
+    MCQ Score: correct_answers out of total_questions
+        - description about candidate regarding skills on basis of MCQ's
+        -
+
+
+    Theory Questions Attempted:
+        display the given marks for each theory question and description too for each question
+        theory_results only holds the answers whose marks are borderline, review those in more detail
+        -
+        -
+        -
+
+    Coding Questions Attempted:
+        coding_results holds the outcome of running each solution against its test cases (tests_passed).
+        a "pending" mark means the solution could not be run yet: say it awaits review, do not score it
+        display the given marks for each coding question and description too for each question
+        -
+        -
+        -
+
+    Overall Feedback:
+        -
+        -
+        -
+
+    Do not recalculate any marks and do not add a total marks line, it is appended to the report separately.
+    The content shall be in above format can include some profile details
+    This Report will just summarize the candidate and give feedback on the scores in above format
+    No unwanted stuff required in Final Report
+    Give me this in Text Well Formatted
+    """
+
+
+# --- LLM Client and Chains ---
+
+# Texts shorter than this say too little about the model's tokenizer to calibrate the estimate on
+CALIBRATION_MIN_CHARS = 2000
+
+# Expected completion size per stage, charged against the tokens-per-minute quota up front
+COMPLETION_TOKENS = {"jd_analysis": 400, "skills": 800, "mcq": 1500, "theory": 1500, "coding": 3000, "report": 1500}
+
+def _single_attempt():
+    return retry(reraise=True, stop=stop_after_attempt(1))
+
+
+def disable_client_retries():
+    # The Gemini client wraps every request in its own tenacity retry (exponential sleeps on any
+    # GoogleAPIError, 429s included), ignoring max_retries and timeout. Those retries would hold
+    # the scheduler's concurrency slot and skip its global 429 pause, so each call is a single
+    # request and the LLMScheduler owns retries, backoff and the per-attempt timeout.
+    genai_chat_models._create_retry_decorator = _single_attempt
+
+
+def get_llm_object():
+    # if "GOOGLE_API_KEY" not in os.environ:
+    #     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google AI API key: ")
+
+    disable_client_retries()
+    llm = ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-001",
+        temperature=0,
+        max_tokens=None,
+        # other params...
+    )
+    return llm
+
+
+class ChainRegistry:
+    # One configured client and the compiled chains for every stage, shared by all requests.
+
+    def __init__(self, llm=None, scheduler=None):
+        self.llm = llm if llm is not None else get_llm_object()
+        self.scheduler = scheduler if scheduler is not None else LLMScheduler()
+        self.metrics_callback = LLMMetricsCallback()
+        self._chars_per_token = None
+
+        self.jd_analysis_chain = self._structured_chain("jd_analysis", JD_ANALYSIS_TEMPLATE, ["job_desc"], JobAnalysis)
+        self.skills_chain = self._structured_chain("skills", SKILLS_TEMPLATE, ["text", "job_desc"], Profile)
+        # Exam sections are generated by independent chains so they can run concurrently
+        self.section_chains = {
+            "mcq": self._structured_chain("mcq", MCQ_TEMPLATE, ["skills", "test_details"], MCQSection),
+            "theory": self._structured_chain("theory", THEORY_TEMPLATE, ["skills", "test_details"], TheorySection),
+            "coding": self._structured_chain("coding", CODING_TEMPLATE, ["skills", "test_details"], CodingSection),
+        }
+
+        report_prompt = PromptTemplate(template=REPORT_TEMPLATE, input_variables=["final_data", "scores"])
+        self.report_chain = self._instrument("report", REPORT_TEMPLATE, RunnableSequence(report_prompt | self.llm),
+                                             PRIORITY_REPORT)
+
+    def estimate_tokens(self, text: str) -> int:
+        # Local estimate at the model's characters per token. The ratio is measured once per process
+        # with the model's own counter (a countTokens request for Gemini) and cached, so counting
+        # never waits on the network after that; clients that cannot count keep the default ratio.
+        if self._chars_per_token is None and len(text) >= CALIBRATION_MIN_CHARS:
+            try:
+                self._chars_per_token = max(1.0, len(text) / max(1, self.llm.get_num_tokens(text)))
+            except Exception:
+                self._chars_per_token = float(CHARS_PER_TOKEN)
+        return math.ceil(len(text) / (self._chars_per_token or CHARS_PER_TOKEN))
+
+    def _structured_chain(self, stage, template, input_variables, schema):
+        prompt = PromptTemplate(template=template, input_variables=input_variables)
+        structured_llm = self.llm.with_structured_output(schema)
+        return self._instrument(stage, template, RunnableSequence(prompt | structured_llm), PRIORITY_GENERATION)
+
+    def _instrument(self, stage, template, chain, priority):
+        # Token usage and retries are recorded per stage by the metrics callback, and every call
+        # is admitted by the shared scheduler
+        chain = chain.with_config(tags=[f"stage:{stage}"], callbacks=[self.metrics_callback])
+        return ScheduledChain(chain, self.scheduler, stage, template, priority, COMPLETION_TOKENS[stage])
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def init_chain_registry(llm=None, scheduler=None) -> ChainRegistry:
+    global _registry
+    with _registry_lock:
+        _registry = ChainRegistry(llm, scheduler)
+    return _registry
+
+
+def get_chain_registry() -> ChainRegistry:
+    # Built at app startup; the lazy path only covers scripts that import the helpers directly.
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ChainRegistry()
+    return _registry
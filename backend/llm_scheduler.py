@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from metrics import metrics
+from report_input import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Provider quota for the whole process; 0 disables a limit (defaults: gemini-2.0-flash tier 1)
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 2000))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 4_000_000))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 16))
+# Time a call may spend queued, backing off and running, across all its attempts
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", 180))
+# Time one provider request may take before it is abandoned and retried
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("LLM_ATTEMPT_TIMEOUT_SECONDS", 90))
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", 4))
+LLM_BACKOFF_SECONDS = float(os.environ.get("LLM_BACKOFF_SECONDS", 1.0))
+LLM_MAX_BACKOFF_SECONDS = float(os.environ.get("LLM_MAX_BACKOFF_SECONDS", 30.0))
+
+# Lower runs first: a candidate waiting on their report beats questions generated ahead of time,
+# and both beat filling question pools
+PRIORITY_REPORT = 0
+PRIORITY_GENERATION = 1
+PRIORITY_BACKGROUND = 2
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+metrics.describe("llm_queue_wait_seconds", "histogram", "Time LLM calls waited for quota or a free slot.")
+metrics.describe("llm_coalesced_total", "counter", "LLM calls served by an identical call already in flight.")
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class LLMAttemptTimeout(TimeoutError):
+    pass
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    # google.api_core errors carry the HTTP status as `code`, HTTP clients as `status_code`;
+    # client wrappers keep the original error as the cause
+    while error is not None:
+        code = getattr(error, "code", None)
+        if not isinstance(code, int):
+            code = getattr(error, "status_code", None)
+        if isinstance(code, int):
+            return code
+        error = error.__cause__
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    return status_code(error) in RETRYABLE_STATUS_CODES or isinstance(error, (ConnectionError, LLMAttemptTimeout))
+
+
+class TokenBucket:
+    # Refills continuously at `per_minute` / 60 per second up to one minute's worth
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single call larger than the bucket still gets through once it is full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity > 0:
+            self.level -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    # Every LLM call of the process goes through here. Calls are admitted in priority order once
+    # the request and token buckets allow it and a concurrency slot is free. 429 and 5xx errors,
+    # and attempts that run past the attempt timeout, are retried with jittered exponential
+    # backoff; a 429 also pauses admission for everyone, so a quota overrun drains instead of
+    # turning into a retry storm. Identical calls already in flight are coalesced onto a single
+    # provider request.
+
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 deadline_seconds: float = LLM_DEADLINE_SECONDS, max_attempts: int = LLM_MAX_ATTEMPTS,
+                 backoff_seconds: float = LLM_BACKOFF_SECONDS, max_backoff_seconds: float = LLM_MAX_BACKOFF_SECONDS,
+                 attempt_timeout_seconds: float = LLM_ATTEMPT_TIMEOUT_SECONDS):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.deadline_seconds = deadline_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.active = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._changed = asyncio.Event()
+        self._in_flight = {}
+        # Shared call -> number of callers awaiting it
+        self._callers = {}
+
+    # --- Admission ---
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _admission_delay(self, tokens: int) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if delay == 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+        return delay
+
+    async def _acquire(self, stage: str, priority: int, sequence: int, tokens: int, deadline: float):
+        waiter = (priority, sequence)
+        heapq.heappush(self._waiters, waiter)
+        start = time.monotonic()
+        try:
+            while True:
+                delay = None
+                if self._waiters[0] == waiter and self.active < self.max_concurrency:
+                    delay = self._admission_delay(tokens)
+                    if delay == 0:
+                        heapq.heappop(self._waiters)
+                        self.active += 1
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMDeadlineExceeded(f"LLM call for {stage} timed out waiting for quota")
+                # asyncio.timeout rather than wait_for: on 3.11 wait_for can swallow a cancellation
+                # that arrives as the event fires, and a cancelled worker would never stop
+                changed = self._changed
+                try:
+                    async with asyncio.timeout(min(delay or remaining, remaining)):
+                        await changed.wait()
+                except TimeoutError:
+                    pass
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+        # The next waiter in line may be admissible now too
+        self._notify()
+        metrics.observe("llm_queue_wait_seconds", time.monotonic() - start, stage=stage)
+
+    def _release(self):
+        self.active -= 1
+        self._notify()
+
+    async def _back_off(self, stage: str, error: BaseException, attempt: int, deadline: float):
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        if time.monotonic() + delay >= deadline:
+            raise error
+        logger.warning("LLM call for %s failed (attempt %d/%d, retrying in %.1fs): %s",
+                       stage, attempt, self.max_attempts, delay, error)
+        metrics.inc("llm_retries_total", stage=stage)
+        if status_code(error) == 429:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        await asyncio.sleep(delay)
+
+    # --- Calls ---
+
+    async def run(self, stage: str, call: Callable[[], Awaitable], priority: int = PRIORITY_GENERATION,
+                  tokens: int = 0, key: Optional[str] = None, deadline_seconds: Optional[float] = None):
+        # `call()` makes one provider request; `key` identifies calls whose results are interchangeable
+        if key is None:
+            return await self._run(stage, call, priority, tokens, deadline_seconds)
+
+        # The call runs in a task of its own, so a cancelled caller, the first one included, only
+        # stops waiting; the call is cancelled once no caller is left waiting for it
+        shared = self._in_flight.get(key)
+        if shared is None:
+            shared = self._in_flight[key] = asyncio.create_task(
+                self._run(stage, call, priority, tokens, deadline_seconds))
+            shared.add_done_callback(lambda task: self._forget(key, task))
+        else:
+            metrics.inc("llm_coalesced_total", stage=stage)
+        self._callers[shared] = self._callers.get(shared, 0) + 1
+        try:
+            return await asyncio.shield(shared)
+        finally:
+            self._callers[shared] -= 1
+            if not self._callers[shared]:
+                del self._callers[shared]
+                if not shared.done():
+                    # Later callers start a fresh call rather than join one being cancelled
+                    self._forget(key, shared)
+                    shared.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Nobody may be waiting on the shared result, don't warn about unretrieved errors
+        if task.done():
+            task.cancelled() or task.exception()
+
+    async def _run(self, stage, call, priority, tokens, deadline_seconds):
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        sequence = next(self._sequence)
+        for attempt in range(1, self.max_attempts + 1):
+            await self._acquire(stage, priority, sequence, tokens, deadline)
+            timeout = self._attempt_timeout(deadline)
+            try:
+                async with timeout:
+                    return await call()
+            except Exception as e:
+                if timeout.expired():
+                    e = self._timed_out(stage, deadline, e)
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    raise e
+                error = e
+            finally:
+                self._release()
+            await self._back_off(stage, error, attempt, deadline)
+
+    def _attempt_timeout(self, deadline: float):
+        # Each attempt gets the attempt timeout, cut short by what is left of the call's deadline
+        return asyncio.timeout(min(self.attempt_timeout_seconds, deadline - time.monotonic()))
+
+    def _timed_out(self, stage: str, deadline: float, error: BaseException) -> TimeoutError:
+        # Only an attempt that timed out with deadline to spare may be retried
+        if time.monotonic() >= deadline:
+            timeout = LLMDeadlineExceeded(f"LLM call for {stage} exceeded its deadline")
+        else:
+            timeout = LLMAttemptTimeout(f"LLM call for {stage} took longer than {self.attempt_timeout_seconds}s")
+        timeout.__cause__ = error
+        return timeout
+
+    async def stream(self, stage: str, open_stream: Callable, priority: int = PRIORITY_REPORT, tokens: int = 0,
+                     deadline_seconds: Optional[float] = None):
+        # Streams are never coalesced, and only retried while nothing has been yielded yet
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        sequence = next(self._sequence)
+        for attempt in range(1, self.max_attempts + 1):
+            await self._acquire(stage, priority, sequence, tokens, deadline)
+            started = False
+            try:
+                chunks = open_stream().__aiter__()
+                while True:
+                    # Only the wait for the next chunk is timed, never the consumer's work between chunks
+                    timeout = self._attempt_timeout(deadline)
+                    try:
+                        async with timeout:
+                            chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    except TimeoutError as e:
+                        if timeout.expired():
+                            raise self._timed_out(stage, deadline, e)
+                        raise
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not is_retryable(e) or attempt == self.max_attempts:
+                    raise
+                error = e
+            finally:
+                self._release()
+            await self._back_off(stage, error, attempt, deadline)
+
+
+# --- Scheduled Chains ---
+
+def call_key(stage: str, input: dict) -> str:
+    payload = json.dumps(input, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{stage}\0{payload}".encode("utf-8")).hexdigest()
+
+
+class ScheduledChain:
+    # Wraps a compiled chain so its async calls go through the scheduler. The token estimate
+    # charged up front is the prompt plus the stage's expected completion size.
+
+    def __init__(self, chain, scheduler: LLMScheduler, stage: str, template: str, priority: int,
+                 completion_tokens: int):
+        self.chain = chain
+        self.scheduler = scheduler
+        self.stage = stage
+        self.priority = priority
+        self.base_tokens = estimate_tokens(template) + completion_tokens
+
+    def estimate_tokens(self, input: dict) -> int:
+        return self.base_tokens + sum(estimate_tokens(str(value)) for value in input.values())
+
+    async def ainvoke(self, input: dict, priority: Optional[int] = None, **kwargs):
+        priority = self.priority if priority is None else priority
+        return await self.scheduler.run(self.stage, lambda: self.chain.ainvoke(input, **kwargs), priority,
+                                        self.estimate_tokens(input), key=call_key(self.stage, input))
+
+    def astream(self, input: dict, **kwargs):
+        return self.scheduler.stream(self.stage, lambda: self.chain.astream(input, **kwargs), self.priority,
+                                     self.estimate_tokens(input))
+
+    def invoke(self, input: dict, **kwargs):
+        # Synchronous callers (scripts) bypass the scheduler
+        return self.chain.invoke(input, **kwargs)
@@ -1,23 +1,86 @@
 from fastapi import FastAPI, UploadFile, File,Form, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from uuid import uuid4
+from contextlib import asynccontextmanager
 import os
-import shutil
 import json
-from typing import List
+import shutil
+import logging
+from typing import List, Optional
 import zipfile
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import LLMChain
-import PyPDF2
-from langchain_core.runnables.base import RunnableSequence
-from pydantic import BaseModel, Field
-from typing import List
-import json
-
-app = FastAPI()
+from threading import Lock
+import asyncio
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from answer_log import ANSWER_LOG_NAME, AnswerLog
+from batches import create_batch, get_batch_status
+from code_grader import grade_coding_answers, shutdown_grader_executor, summarize_coding_results
+from db import init_db
+from exam_templates import (ANALYSIS_FAILED, build_template_analysis, exam_prompt_details, get_template,
+                            load_template_analysis, load_template_job_description, mark_template_analysis_failed,
+                            register_template, save_template_analysis, skills_prompt_job_description)
+from jobs import FAILED, GenerationWorkerPool, get_latest_job
+from exam_bundle import (IDENTITY, bundle_etag, candidate_exam_view, candidate_questions, choose_encoding, compress,
+                         encode_bundle, etag_matches)
+from exam_cache import ExamCache
+from notifier import CandidateNotifier
+from question_pools import (QUESTION_POOL_PER_SKILL, add_pool_questions, finish_pool_build, get_pool_status,
+                            is_pool_ready, pool_skills, sample_pool_exam, start_pool_build)
+from pdf_text import ResumeParseError, get_pdf_executor, load_resume_text, shutdown_pdf_executor
+from llm import Profile, get_chain_registry, init_chain_registry
+from llm_scheduler import PRIORITY_BACKGROUND
+from metrics import MetricsMiddleware, log_candidate_event, metrics, stage, timed_iter
+from report_input import encode_report_input
+from result_zip import (ArchiveLengthCache, archive_etag, attachment_disposition, document_entry, file_entry,
+                        iter_range, iter_zip, parse_range)
+from scoring import compute_scores, marks_line, scores_for_prompt
+from theory_scorer import cohort_similarities
+from skill_cache import SkillCache, skill_cache_key
+from uploads import (MULTIPART_OVERHEAD_BYTES, RequestSizeLimitMiddleware, extract_zip_member, read_upload,
+                     save_upload)
+from storage import (STATUS_COMPLETED, STATUS_FAILED, STATUS_READY, DocumentNotFound,
+                     FileSystemStore, create_store)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the LLM client and every stage chain once, before serving requests
+    app.state.chains = init_chain_registry()
+    init_db()
+    generation_pool.start()
+    yield
+    await generation_pool.stop()
+    await answer_log.close()
+    shutdown_pdf_executor()
+    shutdown_grader_executor()
+
+
+app = FastAPI(lifespan=lifespan)
+
+logger = logging.getLogger(__name__)
+
+MAX_RESUME_BYTES = int(os.environ.get("MAX_RESUME_BYTES", 10 * 1024 * 1024))
+MAX_EXAM_DETAILS_BYTES = int(os.environ.get("MAX_EXAM_DETAILS_BYTES", 1024 * 1024))
+MAX_AUDIO_BYTES = int(os.environ.get("MAX_AUDIO_BYTES", 50 * 1024 * 1024))
+MAX_BATCH_UPLOAD_BYTES = int(os.environ.get("MAX_BATCH_UPLOAD_BYTES", 512 * 1024 * 1024))
+MAX_BATCH_RESUMES = int(os.environ.get("MAX_BATCH_RESUMES", 500))
+# Build a question pool for every template registered through /exam_templates
+QUESTION_POOL_AUTO_BUILD = os.environ.get("QUESTION_POOL_AUTO_BUILD", "1") == "1"
+QUESTION_POOL_CONCURRENCY = int(os.environ.get("QUESTION_POOL_CONCURRENCY", 4))
+
+app.add_middleware(RequestSizeLimitMiddleware, limits={
+    "/upload_resume": MAX_RESUME_BYTES + MAX_EXAM_DETAILS_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/exam_templates": MAX_EXAM_DETAILS_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/upload_audio/": MAX_AUDIO_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/batches": MAX_BATCH_UPLOAD_BYTES + MAX_EXAM_DETAILS_BYTES + MULTIPART_OVERHEAD_BYTES,
+})
+# Outermost, so rejected uploads are counted too
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -26,292 +89,405 @@ async def root():
 
 STORAGE_DIR = "storage"
 
+MAX_SECTION_WAIT_SECONDS = 30
+SECTION_RECHECK_SECONDS = 5
+
+section_notifier = CandidateNotifier()
+
+exam_cache = ExamCache(
+    max_bytes=int(os.environ.get("EXAM_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    revalidate_seconds=float(os.environ.get("EXAM_CACHE_REVALIDATE_SECONDS", 2)),
+)
+
+# "filesystem" keeps the original per-candidate JSON files, "sql" stores documents in DATABASE_URL
+store = create_store(os.environ.get("STORAGE_BACKEND", "filesystem"), STORAGE_DIR)
+
+archive_lengths = ArchiveLengthCache()
+
+# Autosaved answers; kept on local disk next to the uploads whatever the storage backend
+answer_log = AnswerLog(
+    STORAGE_DIR,
+    flush_seconds=float(os.environ.get("ANSWER_LOG_FLUSH_SECONDS", 0.005)),
+    max_keys=int(os.environ.get("ANSWER_LOG_MAX_KEYS", 100_000)),
+)
+
+skill_cache = SkillCache(
+    os.path.join(STORAGE_DIR, "skill_cache.db"),
+    max_entries=int(os.environ.get("SKILL_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.environ.get("SKILL_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+)
+
 # --- Utility Functions ---
 
 def create_candidate_folder():
     candidate_id = str(uuid4())
     folder_path = os.path.join(STORAGE_DIR, candidate_id)
     os.makedirs(folder_path, exist_ok=True)
+    store.create_candidate(candidate_id)
     return candidate_id, folder_path
 
+def document_ref(filepath: str):
+    # Map a STORAGE_DIR/<candidate_id>/<name> path onto the storage backend
+    relative_path = os.path.relpath(filepath, STORAGE_DIR).replace(os.sep, "/")
+    candidate_id, _, name = relative_path.partition("/")
+    return candidate_id, name
 
-def save_resume(resume: UploadFile, folder_path: str):
+
+async def save_resume(resume: UploadFile, folder_path: str):
     resume_path = os.path.join(folder_path, "resume.pdf")
-    with open(resume_path, "wb") as buffer:
-        shutil.copyfileobj(resume.file, buffer)
+    await save_upload(resume, resume_path, MAX_RESUME_BYTES)
 
-def save_exam_details(exam_details: UploadFile, folder_path: str):
-    exam_details_path = os.path.join(folder_path, "job_desc.json")
-    with open(exam_details_path, "wb") as buffer:
-        shutil.copyfileobj(exam_details.file, buffer)
+async def read_exam_details(exam_details: UploadFile) -> dict:
+    try:
+        return json.loads(await read_upload(exam_details, MAX_EXAM_DETAILS_BYTES))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Exam details must be a valid JSON file.")
+
+async def resolve_exam_template(exam_details: Optional[UploadFile], template_id: Optional[str]) -> str:
+    # Candidates reference a registered JD; an uploaded JD is registered on the fly, and
+    # re-uploads of the same JD map onto the same template
+    if template_id:
+        template, created = await run_in_threadpool(get_template, template_id), False
+        if template is None:
+            raise HTTPException(status_code=404, detail="Exam template not found.")
+    elif exam_details is None:
+        raise HTTPException(status_code=400, detail="Either exam_details or template_id is required.")
+    else:
+        template, created = await run_in_threadpool(register_template, await read_exam_details(exam_details))
+    if created or template.analysis_status == ANALYSIS_FAILED:
+        start_template_analysis(template.id)
+    return template.id
+
+# Analyses started by uploads, referenced until done. Not request background tasks: those are
+# dropped when the request fails afterwards, which would leave the template pending for good.
+_analysis_tasks = set()
+
+def start_template_analysis(template_id: str):
+    task = asyncio.create_task(analyze_template(template_id))
+    _analysis_tasks.add(task)
+    task.add_done_callback(_analysis_tasks.discard)
+
+def save_template_reference(candidate_id: str, template_id: str):
+    store.save_document(candidate_id, "exam_template.json", {"template_id": template_id})
 
 def load_exam_details(filepath):
-    with open(filepath, "r") as f:
-        data = json.load(f)
-        return data
+    return load_json(filepath)
 
-def save_audio(audio: UploadFile, folder_path: str):
-    audio_path = os.path.join(folder_path, "audio.mp3")
-    with open(audio_path, "wb") as buffer:
-        shutil.copyfileobj(audio.file, buffer)
+def load_job_description(candidate_id: str):
+    # Returns the candidate's JD and its template id; candidates from before templates existed
+    # have their own job_desc.json
+    try:
+        template_id = store.load_document(candidate_id, "exam_template.json")["template_id"]
+    except DocumentNotFound:
+        return load_exam_details(os.path.join(STORAGE_DIR, candidate_id, "job_desc.json")), None
+    job_description = load_template_job_description(template_id)
+    if job_description is None:
+        raise HTTPException(status_code=404, detail="Exam template not found.")
+    return job_description, template_id
+
+# Extensions an audio answer may be stored under; the upload's name only picks one of these
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".opus", ".webm", ".aac"}
+AUDIO_FOLDER = "audio"
+
+def audio_extension(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower() or ".mp3"
+    if extension not in AUDIO_EXTENSIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unsupported audio format, use one of: {', '.join(sorted(AUDIO_EXTENSIONS))}")
+    return extension
+
+async def save_audio(audio: UploadFile, folder_path: str, extension: str = ".mp3"):
+    # Always stored under a name the server picks, never the client's, so an upload can't
+    # replace the exam or any other file in the candidate folder
+    audio_folder = os.path.join(folder_path, AUDIO_FOLDER)
+    await run_in_threadpool(os.makedirs, audio_folder, exist_ok=True)
+    audio_path = os.path.join(audio_folder, f"answer{extension}")
+    await save_upload(audio, audio_path, MAX_AUDIO_BYTES)
+    # A re-recording in another format replaces the earlier one
+    for name in await run_in_threadpool(os.listdir, audio_folder):
+        if name.startswith("answer.") and name != f"answer{extension}" and not name.endswith(".part"):
+            await run_in_threadpool(os.remove, os.path.join(audio_folder, name))
+
+_test_output_lock = Lock()
 
 def save_test_output(folder_path: str, data: dict):
-    output_path = os.path.join(folder_path, "testoutput.json")
-    with open(output_path, "w") as f:
-        json.dump(data, f, indent=2)
+    candidate_id = os.path.basename(folder_path)
+    document = store.save_document(candidate_id, "testoutput.json", data)
+    # Write-through so the question endpoints never reparse what this process just wrote
+    exam_cache.put(candidate_id, data, document.version, document.size)
+
+def save_test_section(folder_path: str, section_data: dict):
+    # Merge one generated section into testoutput.json as soon as it is ready
+    candidate_id = os.path.basename(folder_path)
+    with _test_output_lock:
+        try:
+            data = dict(store.load_document(candidate_id, "testoutput.json"))
+        except DocumentNotFound:
+            data = {}
+        data.update(section_data)
+        save_test_output(folder_path, data)
 
 
 def load_test_output(folder_path: str):
-    output_path = os.path.join(folder_path, "testoutput.json")
-    if not os.path.exists(output_path):
+    candidate_id = os.path.basename(folder_path)
+    data = exam_cache.get(candidate_id, lambda: store.document_version(candidate_id, "testoutput.json"))
+    if data is not None:
+        return data
+    try:
+        document = store.read_document(candidate_id, "testoutput.json")
+    except DocumentNotFound:
         raise HTTPException(status_code=404, detail="Test output not found")
-    with open(output_path, "r") as f:
-        return json.load(f)
+    exam_cache.put(candidate_id, document.data, document.version, document.size)
+    return document.data
+
+async def wait_for_test_section(candidate_id: str, key: str, wait: float = 0):
+    return await wait_for_test_sections(candidate_id, (key,), wait)
+
+async def wait_for_test_sections(candidate_id: str, keys, wait: float = 0):
+    # Long-poll: hold the request until generation publishes the sections, the job fails or `wait` runs out
+    deadline = time.monotonic() + min(max(wait, 0), MAX_SECTION_WAIT_SECONDS)
+    while True:
+        published = section_notifier.watch(candidate_id)
+        try:
+            return await run_in_threadpool(load_test_section, candidate_id, keys)
+        except HTTPException as e:
+            remaining = deadline - time.monotonic()
+            if e.status_code != 202 or remaining <= 0:
+                raise
+        # Re-check periodically too, generation may be running in another worker process
+        await section_notifier.wait(published, min(remaining, SECTION_RECHECK_SECONDS))
+
+def load_test_section(candidate_id: str, keys):
+    # Sections are published independently; 202 until the requested ones have been written
+    folder_path = os.path.join(STORAGE_DIR, candidate_id)
+    try:
+        data = load_test_output(folder_path)
+    except HTTPException:
+        raise_generation_pending(candidate_id)
+    if any(key not in data for key in keys):
+        raise_generation_pending(candidate_id)
+    return data
+
+def raise_generation_pending(candidate_id: str):
+    job = get_latest_job(candidate_id)
+    if job is not None and job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Test generation failed: {job.last_error}")
+    raise HTTPException(status_code=202, detail="Test generation in progress. Please retry.")
+
+async def get_template_analysis(template_id: str, candidate_id: str = None) -> dict:
+    # Computed once per template; concurrent first calls share one LLM request via the scheduler
+    analysis = await run_in_threadpool(load_template_analysis, template_id)
+    if analysis is not None:
+        return analysis
+
+    job_description = await run_in_threadpool(load_template_job_description, template_id)
+    llm_chain = get_chain_registry().jd_analysis_chain
+    try:
+        with stage("jd_analysis", candidate_id):
+            output = await llm_chain.ainvoke(input={"job_desc": job_description.get("requirements", "")})
+    except Exception as e:
+        await run_in_threadpool(mark_template_analysis_failed, template_id, f"{type(e).__name__}: {e}")
+        raise
 
-def read_resume_from_pdf(pdf_path):
+    analysis = build_template_analysis(job_description, output.model_dump())
+    await run_in_threadpool(save_template_analysis, template_id, analysis)
+    return analysis
+
+async def analyze_template(template_id: str):
+    # Background precompute at registration; failures are recorded and retried by the next upload
+    try:
+        await get_template_analysis(template_id)
+    except Exception:
+        logger.exception("Analysis of exam template %s failed", template_id)
+        return
+    if QUESTION_POOL_AUTO_BUILD:
+        await build_question_pool(template_id)
+
+# --- Question Pools ---
+
+# Section names as the exam prompts spell them in test_details
+POOL_SECTION_TITLES = {"mcq": "MCQ", "theory": "Theory", "coding": "Coding"}
+
+async def generate_pool_questions(template_id: str, analysis: dict, section: str, skill: str, kind: str) -> int:
+    # One LLM call per skill and section, through the regular section chains at background priority
+    skills = {"mandatory_skills": [skill] if kind == "mandatory" else [],
+              "important_skills": [skill] if kind == "important" else [],
+              "unnecessary_skills": []}
+    test_details = {"difficulty_level": analysis.get("difficulty_level"),
+                    "test_details": {POOL_SECTION_TITLES[section]: {"no_of_questions": QUESTION_POOL_PER_SKILL}}}
+    llm_chain = get_chain_registry().section_chains[section]
+    with stage(f"pool_generation_{section}"):
+        output = await llm_chain.ainvoke(input={"skills": [skills], "test_details": test_details},
+                                         priority=PRIORITY_BACKGROUND)
+    questions = output.model_dump()[EXAM_SECTIONS[section]]
+    return await run_in_threadpool(add_pool_questions, template_id, section, skill, analysis.get("difficulty_level"),
+                                   questions)
+
+async def build_question_pool(template_id: str):
+    # Pre-generates questions for every skill of the JD so candidates' exams can be drawn from the
+    # pool instead of generated; rebuilding adds to the pool, duplicates are skipped
+    if not await run_in_threadpool(start_pool_build, template_id):
+        return
+    error = None
     try:
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            return text
+        analysis = await get_template_analysis(template_id)
+        semaphore = asyncio.Semaphore(QUESTION_POOL_CONCURRENCY)
+
+        async def generate(section, skill, kind):
+            async with semaphore:
+                return await generate_pool_questions(template_id, analysis, section, skill, kind)
+
+        calls = [
+            (section, skill, kind)
+            for section, config in analysis["sections"].items() if config["no_of_questions"] > 0
+            for skill, kind in pool_skills(analysis)
+        ]
+        results = await asyncio.gather(*[generate(*call) for call in calls], return_exceptions=True)
+        failed = [(call, result) for call, result in zip(calls, results) if isinstance(result, Exception)]
+        for (section, skill, _), result in failed:
+            logger.error("Pool generation for template %s (%s, %s) failed: %r", template_id, section, skill, result)
+        if failed:
+            error = f"{len(failed)} of {len(calls)} generation calls failed"
     except Exception as e:
-        return f"Error reading PDF: {e}"
-
-def clean_resume_text(text):
-    import re
-    # Replace multiple newlines and bullets
-    text = re.sub(r"[•\n]+", "\n", text)
-    # Remove leading/trailing whitespace
-    return text.strip()
-
-def get_llm_object():
-    # if "GOOGLE_API_KEY" not in os.environ:
-    #     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google AI API key: ")
-
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-001",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-        # other params...
-    )
-    return llm
-
-
-def extract_required_skills_from_resume_and_jd(resume_path: str, job_description: str) -> dict:
-
-    resume_text = read_resume_from_pdf(resume_path)
-    text = clean_resume_text(resume_text)
-
-    llm = get_llm_object()
-
-    template = """
-    You are an expert examiner.
-    Here is the resume text: {text} and Job Description: {job_desc}
-    Filter out Skills that needs to be tested for an interview of a candidate in three sections
-    Mandatory skills, important skills, unnecessary skills
-    Mandatory contains as per name mandatory skills according to Job Description.
-    Important contains skills that can be tested for overall candidate knowledge.
-    Unnecessary contains unrelated skills to Job Description.
-    Get all these in Exam Skills and also get some more profile details as per requirement
-    """
-
-    class Skills(BaseModel):
-        mandatory_skills: List[str] = Field(description="List of mandatory skills.")
-        important_skills: List[str] = Field(description="List of important skills.")
-        unnecessary_skills: List[str] = Field(description="List of unnecessary skills.")
-    
-    class Profile(BaseModel):
-        name: str = Field(description="The name of candidate.")
-        qualification: str = Field(description="Highest qualification of a candidate.")
-        technical_skills: List[str] = Field(description="Technical skills of a candidate.")
-        soft_skills: List[str] = Field(description="Soft skills of a candidate.")
-        programming_languages: List[str] = Field(description="Programming Languages that candidate knows.")
-        email: str = Field(description="EmailId of a candidate.")
-        contact_no: str = Field(description="Contact Number of a candidate.")
-        skills_in_jd: List[str] = Field(description="skills required as per JD.")
-        exam_skills: List[Skills] = Field(description="Skills obtained for Examination.")
-
-    prompt = PromptTemplate(template=template, input_variables=["text", "job_desc"])
-    structured_llm = llm.with_structured_output(Profile)
-    llm_chain = RunnableSequence(prompt | structured_llm)
-    skills: Skills = llm_chain.invoke(input={"text": text, "job_desc": job_description})
-
-    return skills.model_dump()
-
-
-def extract_info_from_resume(skills: dict, job_description: dict) -> dict:
-
-    llm = get_llm_object()
-
-    template = """
-    You are an expert exam creator.
-
-    ### Skills Overview:
-    {skills}
-
-    ### Skill Prioritization:
-    - **mandatory_skills** (High priority, 60% weightage)
-    - **important_skills** (Medium priority, 40% weightage)
-    - **unnecessary_skills** (Ignored)
-
-    ### Test Overview:
-    Test Details: {test_details}
-    Experience Level & Difficulty: test_details.difficulty_level
-
-    ### Exam Sections:
-
-    1️ MCQs
-    - Create test_details['test_details']['MCQ']['no_of_questions'] MCQs.
-    - Difficulty must **strictly** align with the specified test_details.difficulty_level. Use the following mapping:
-    - Beginner → basic conceptual MCQs
-    - Intermediate → practical understanding
-    - Advanced → debugging, tricky scenarios
-    - Expert → integration and real-world architecture
-    - Master → advanced scenarios, optimization, pitfalls
-    - Focus: primarily on **mandatory_skills** (70%), some on **important_skills** (30%), ignore **unnecessary_skills**.
-    - Each MCQ:
-    - Technically correct, unambiguous
-    - **Exactly 1 correct answer**
-    - Include **corner case** coverage where relevant
-
-    2️ Theory Questions
-    - Generate test_details['test_details']['Theory']['no_of_questions'] theory questions.
-    - Each answer should require **4-5 lines**.
-    - **Difficulty strictly aligned** with test_details.difficulty_level:
-    - Beginner → basic definitions
-    - Intermediate → explain how it works
-    - Advanced → comparisons, pros/cons
-    - Expert → architectural decisions
-    - Master → advanced pitfalls, security, performance
-    - Focus on **why/how**, testing deeper conceptual understanding.
-
-    3️ **Coding Problems**
-    - Generate test_details['test_details']['Coding']['no_of_questions'] logical coding problems for difficulty level test_details.difficulty_level.
-    - Each question **must**:
-        - Be fully testable with clear **input → output → explanation**.
-        - **Avoid** using external dependencies like databases, files, APIs, or frameworks.
-        - Test core skills: data structures, algorithms, problem-solving, recursion, loops, string manipulation, number theory, etc.
-    - Clearly define:
-        - **Name**
-        - **Description** with detailed constraints
-        - **Examples** (at least 2)
-        - **Test Cases** (with diverse inputs including edge cases)
-    - Ensure **different coding problems for different experience levels**:
-        - Beginner → Simple operations, loops, or conditionals
-        - Intermediate → String manipulation, arrays
-        - Advanced → Recursion, algorithmic thinking
-        - Expert → Optimization, complex data structures
-        - Master → Algorithm design with multiple edge cases, large input constraints
-    """
-
-    class MCQ(BaseModel):
-        question: str = Field(description="The multiple choice question.")
-        options: List[str] = Field(description="List of four options for the question.")
-        answer: str = Field(description="The correct option for the question.")
-
-    class TestCase(BaseModel):
-        input: str = Field(description="The input for the program.")
-        expected_output: str = Field(description="The output for the program.")
-        description: str = Field(description="The description for the program.")
-
-    class CodingQuestion(BaseModel):
-        name: str = Field(description="The coding question name.")
-        description: str = Field(description="The coding question description.")
-        # hints: List[str] = Field(description="hints is required for the question.")
-        example: List[TestCase] = Field(description="List of examples.")
-        test_cases: List[TestCase] = Field(description="List of all the corner case test cases.")
-
-    class TheroticalQuestions(BaseModel):
-        question: str = Field(description="The Therotical question.")
-        expected_answer: str = Field(description="The Answer for the question.")
-
-    class MCQSet(BaseModel):
-        level: str = Field(description="The difficulty level of the questions.")
-        questions: List[MCQ] = Field(description="List of MCQs generated.")
-        therotical_questions: List[TheroticalQuestions] = Field(description="List of Therotical questions generated.")
-        coding_question: List[CodingQuestion] = Field(description="List of Coding Questions generated.")
-
-    prompt = PromptTemplate(template=template, input_variables=["skills", "test_details"])
-    structured_llm = llm.with_structured_output(MCQSet)
-    llm_chain = RunnableSequence(prompt | structured_llm)
-    mcqSet: MCQSet = llm_chain.invoke(input={"skills": skills, "test_details": job_description})
-
-    return mcqSet.model_dump()
-
-async def call_llm_to_generate_report(final_data, test_details):
-
-    llm = get_llm_object()
-
-    template = """
-    You are an expert examiner.
-    Here is the Json output of answers submitted by candidate:
-    {final_data}
-    And the Marks for each question in {test_details}
-    Based on the following Data Generate a Report of the candidate in the below format without formatting
-    Candidate Name:
-    MCQ Score: correct_answers out of total_questions
-        - description about candidate regarding skills on basis of MCQ's
-        - 
-
-
-    Theory Questions Attempted:  
-        Here answer may not match the expected answer totally, still marks shall be calculated on basis of question. 
-        display marks for each coding_questions and description too for each question
-        - 
-        - 
-        -
-        
-    Coding Questions Attempted:  
-        display marks for each coding_questions and description too for each question
-        - 
-        - 
-        -
-
-    Overall Feedback:
-        -
-        -
-        -
-
-    Also shortly summarize how total and obtained marks are calulated and confirm that Last Line is
-    Marks: Obtained/Total Marks
-    
-    The content shall be in above format can include some profile details
-    This Report will just summarize the candidate and will give scores to the candidate in above format
-    No unwanted stuff required in Final Report
-    Give me this in Text Well Formatted
-    """
-
-
-    prompt = PromptTemplate(template=template, input_variables=["final_data", "test_details"])
-    llm_chain = RunnableSequence(prompt | llm)
-    output = llm_chain.invoke(input={"final_data": final_data, "test_details": test_details})
+        logger.exception("Building the question pool of template %s failed", template_id)
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        await asyncio.shield(run_in_threadpool(finish_pool_build, template_id, error))
+
+def publish_pool_exam(folder_path: str, template_id: str) -> List[str]:
+    # Sections drawn from a ready pool are published straight away, so the candidate can start
+    # without waiting for the LLM; the generation job then only fills in what is still missing
+    if not is_pool_ready(template_id):
+        return []
+    analysis = load_template_analysis(template_id)
+    exam = sample_pool_exam(template_id, analysis, seed=os.path.basename(folder_path))
+    if not exam:
+        return []
+    data = {EXAM_SECTIONS[section]: questions for section, questions in exam.items()}
+    if "mcq" in exam:
+        data["level"] = analysis.get("difficulty_level")
+    save_test_section(folder_path, data)
+    return sorted(exam)
+
+async def extract_required_skills_from_resume_and_jd(resume_path: str, job_description: str,
+                                                     candidate_id: str = None) -> dict:
+    # `job_description` is the requirements text, or the template's compact analysis
+
+    # PDF parsing and the cache lookup are blocking, keep them off the event loop
+    with stage("resume_parse", candidate_id):
+        text = await run_in_threadpool(load_resume_text, resume_path, get_pdf_executor())
+
+    # Re-uploads of the same resume for the same role skip the LLM round-trip
+    cache_key = skill_cache_key(text, job_description)
+    cached = await run_in_threadpool(skill_cache.get, cache_key)
+    metrics.inc("skill_cache_lookups_total", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        return cached
+
+    llm_chain = get_chain_registry().skills_chain
+    with stage("skill_extraction", candidate_id):
+        skills: Profile = await llm_chain.ainvoke(input={"text": text, "job_desc": job_description})
+
+    profile = skills.model_dump()
+    await run_in_threadpool(skill_cache.set, cache_key, profile)
+    return profile
+
+
+# Exam section -> key it is published under in testoutput.json
+EXAM_SECTIONS = {"mcq": "questions", "theory": "therotical_questions", "coding": "coding_question"}
+
+async def extract_info_from_resume(skills: dict, job_description: dict, section: str, candidate_id: str = None) -> dict:
+
+    llm_chain = get_chain_registry().section_chains[section]
+    with stage(f"question_generation_{section}", candidate_id):
+        output = await llm_chain.ainvoke(input={"skills": skills, "test_details": job_description})
+
+    return output.model_dump()
+
+def report_chain_input(final_data, scores) -> dict:
+    # Marks are computed locally, the model only writes the feedback around them. Blocking only
+    # for the first report of the process, which calibrates the token estimate.
+    data_text, scores_text = encode_report_input(final_data, scores_for_prompt(scores),
+                                                 count_tokens=get_chain_registry().estimate_tokens)
+    return {"final_data": data_text, "scores": scores_text}
+
+async def call_llm_to_generate_report(final_data, scores):
+
+    llm_chain = get_chain_registry().report_chain
+    output = await llm_chain.ainvoke(input=await run_in_threadpool(report_chain_input, final_data, scores))
 
     return output
 
+async def stream_llm_report(final_data, scores):
+    # Yields report text as the model produces it
+    llm_chain = get_chain_registry().report_chain
+    chain_input = await run_in_threadpool(report_chain_input, final_data, scores)
+    async for chunk in llm_chain.astream(input=chain_input):
+        if chunk.content:
+            yield chunk.content
+
 # --- Background Task to process Resume ---
 
-def process_resume(folder_path: str):
+def save_profile(folder_path: str, profile: dict):
+    store.save_document(os.path.basename(folder_path), "testoutput/profile.json", profile)
+    save_test_section(folder_path, {"profile": profile})
+
+async def process_resume(folder_path: str):
+    candidate_id = os.path.basename(folder_path)
+    with stage("process_resume", candidate_id):
+        await generate_exam(folder_path, candidate_id)
+
+async def generate_exam(folder_path: str, candidate_id: str):
     resume_path = os.path.join(folder_path, "resume.pdf")
-    job_description_path = os.path.join(folder_path, "job_desc.json")
-    job_description = load_exam_details(job_description_path)
-    profile = extract_required_skills_from_resume_and_jd(resume_path, job_description["requirements"])
+    job_description, template_id = await run_in_threadpool(load_job_description, candidate_id)
+    # The template's analysis runs in the background from registration; until it is ready the
+    # skills prompt works from the raw requirements rather than waiting for it
+    analysis = await run_in_threadpool(load_template_analysis, template_id) if template_id is not None else None
+    if analysis is not None:
+        skills_job_description = skills_prompt_job_description(analysis)
+    else:
+        skills_job_description = job_description["requirements"]
+    profile = await extract_required_skills_from_resume_and_jd(resume_path, skills_job_description, candidate_id)
     skills = profile["exam_skills"]
-    extracted_data = extract_info_from_resume(skills, job_description)
-    extracted_data["profile"] = profile
-
-    testoutput_path = os.path.join(folder_path, "testoutput")
-    os.mkdir(testoutput_path)
+    exam_details = exam_prompt_details(job_description)
 
-    profile_path = os.path.join(testoutput_path, "profile.json")
+    await run_in_threadpool(save_profile, folder_path, profile)
 
-    with open(profile_path, "w") as f:
-        json.dump(extracted_data["profile"], f, indent=2)
+    # A retried job only regenerates the sections that are still missing
+    existing = await run_in_threadpool(load_test_output, folder_path)
 
-    save_test_output(folder_path, extracted_data)
+    # Generate MCQ, theory and coding sections concurrently and publish each one as it completes
+    tasks = [
+        asyncio.create_task(extract_info_from_resume(skills, exam_details, section, candidate_id))
+        for section, key in EXAM_SECTIONS.items()
+        if key not in existing
+    ]
+    try:
+        for next_section in asyncio.as_completed(tasks):
+            await run_in_threadpool(save_test_section, folder_path, await next_section)
+            section_notifier.notify(candidate_id)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    await run_in_threadpool(store.set_status, candidate_id, STATUS_READY)
+
+async def on_generation_finished(candidate_id: str, status: str):
+    metrics.inc("generation_jobs_total", status=status)
+    log_candidate_event(candidate_id, "generation_finished", status=status)
+    if status == FAILED:
+        await run_in_threadpool(store.set_status, candidate_id, STATUS_FAILED)
+    section_notifier.notify(candidate_id)
+
+generation_pool = GenerationWorkerPool(
+    process_resume,
+    on_finished=on_generation_finished,
+    # Retrying cannot fix an unreadable resume
+    permanent_errors=(ResumeParseError,),
+    concurrency=int(os.environ.get("GENERATION_WORKERS", 4)),
+    max_attempts=int(os.environ.get("GENERATION_MAX_ATTEMPTS", 3)),
+    backoff_seconds=float(os.environ.get("GENERATION_RETRY_BACKOFF_SECONDS", 5)),
+)
 
 
 # --- API Schemas ---
@@ -325,7 +501,8 @@ class SubmitCodingAnswer(BaseModel):
 class MCQAnswer(BaseModel):
     question: str
     options: List[str]
-    correct_answer: str
+    # Ignored: taken from the stored exam at submit time, the candidate never sees it
+    correct_answer: Optional[str] = None
     submitted_answer: str
 
 class SubmitMCQRequest(BaseModel):
@@ -334,36 +511,329 @@ class SubmitMCQRequest(BaseModel):
 
 # --- API Endpoints ---
 
+@app.post("/exam_templates")
+async def create_exam_template(background_tasks: BackgroundTasks, exam_details: UploadFile = File(...)):
+    # Register a JD once and reference it from every candidate upload by template_id
+    job_description = await read_exam_details(exam_details)
+    template, created = await run_in_threadpool(register_template, job_description)
+    if created:
+        background_tasks.add_task(analyze_template, template.id)
+    return {"template_id": template.id, "created": created, "analysis_status": template.analysis_status}
+
+@app.post("/exam_templates/{template_id}/pool")
+async def build_template_pool(template_id: str, background_tasks: BackgroundTasks):
+    # (Re)build the template's question pool in the background; new questions are added to it
+    if await run_in_threadpool(get_template, template_id) is None:
+        raise HTTPException(status_code=404, detail="Exam template not found.")
+    background_tasks.add_task(build_question_pool, template_id)
+    return {"template_id": template_id, "status_url": f"/exam_templates/{template_id}/pool"}
+
+@app.get("/exam_templates/{template_id}/pool")
+async def question_pool_status(template_id: str):
+    status = await run_in_threadpool(get_pool_status, template_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No question pool for this template.")
+    return status
+
+@app.get("/exam_templates/{template_id}")
+async def get_exam_template(template_id: str):
+    template = await run_in_threadpool(get_template, template_id)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Exam template not found.")
+    return template.to_dict()
+
 @app.post("/upload_resume")
 async def upload_resume(resume: UploadFile = File(...),
-                        exam_details: UploadFile = File(...),
-                        background_tasks: BackgroundTasks = None):
-    candidate_id, folder_path = create_candidate_folder()
-    save_resume(resume, folder_path)
-    save_exam_details(exam_details, folder_path)
+                        exam_details: Optional[UploadFile] = File(default=None),
+                        template_id: Optional[str] = Form(default=None)):
+    template_id = await resolve_exam_template(exam_details, template_id)
+    candidate_id, folder_path = await run_in_threadpool(create_candidate_folder)
+    with stage("resume_upload", candidate_id):
+        await save_resume(resume, folder_path)
+        await run_in_threadpool(save_template_reference, candidate_id, template_id)
+        pooled_sections = await run_in_threadpool(publish_pool_exam, folder_path, template_id)
     # process_resume(folder_path, difficulty_level)
-    background_tasks.add_task(process_resume, folder_path)
-    return JSONResponse(content={"candidate_id": candidate_id})
+    job = await generation_pool.enqueue(candidate_id, folder_path)
+    return JSONResponse(content={"candidate_id": candidate_id, "job_id": job.id, "template_id": template_id,
+                                 "pooled_sections": pooled_sections})
+
+def create_batch_candidate(template_id: str):
+    candidate_id, folder_path = create_candidate_folder()
+    save_template_reference(candidate_id, template_id)
+    publish_pool_exam(folder_path, template_id)
+    return candidate_id, folder_path
+
+def extract_batch_zip(zip_path: str, staging_path: str, limit: int):
+    # Every PDF in the archive is staged for a candidate; anything else is reported back as rejected
+    members, rejected = [], []
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Resumes archive is not a valid ZIP file.")
+    with archive:
+        for info in archive.infolist():
+            filename = os.path.basename(info.filename)
+            if info.is_dir() or not filename or filename.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            if not filename.lower().endswith(".pdf"):
+                rejected.append({"filename": info.filename, "reason": "Not a PDF file."})
+                continue
+            if len(members) >= limit:
+                rejected.append({"filename": info.filename, "reason": f"Batch limit of {MAX_BATCH_RESUMES} resumes reached."})
+                continue
+            resume_path = os.path.join(staging_path, f"{len(members)}.pdf")
+            try:
+                extract_zip_member(archive, info, resume_path, MAX_RESUME_BYTES)
+            except (ValueError, zipfile.BadZipFile, NotImplementedError) as e:
+                rejected.append({"filename": info.filename, "reason": str(e)})
+                continue
+            members.append((resume_path, info.filename))
+    return members, rejected
+
+def create_staged_candidates(template_id: str, staged: list):
+    # Staged resumes are moved into their candidate folders only once the whole upload checked out
+    members = []
+    for resume_path, filename in staged:
+        candidate_id, folder_path = create_batch_candidate(template_id)
+        os.replace(resume_path, os.path.join(folder_path, "resume.pdf"))
+        members.append((candidate_id, folder_path, filename))
+    return members
+
+@app.post("/batches")
+async def upload_resume_batch(exam_details: Optional[UploadFile] = File(default=None),
+                              template_id: Optional[str] = Form(default=None),
+                              resumes: List[UploadFile] = File(default=[]),
+                              resumes_zip: Optional[UploadFile] = File(default=None)):
+    # Many resumes against one JD, as multipart files and/or a ZIP of PDFs. The JD is registered
+    # (or looked up) once for the whole batch; generation runs on the shared worker pool.
+    template_id = await resolve_exam_template(exam_details, template_id)
+    if not resumes and resumes_zip is None:
+        raise HTTPException(status_code=400, detail="No resumes uploaded.")
+    if len(resumes) > MAX_BATCH_RESUMES:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {MAX_BATCH_RESUMES} resumes.")
+
+    batch_id = str(uuid4())
+    # Every upload is size-checked and the ZIP validated in a staging folder first, so a rejected
+    # request leaves no candidates behind
+    staging_path = os.path.join(STORAGE_DIR, f"batch-{batch_id}")
+    os.makedirs(staging_path)
+    try:
+        staged, rejected = [], []
+        for resume in resumes:
+            resume_path = os.path.join(staging_path, f"upload-{len(staged)}.pdf")
+            await save_upload(resume, resume_path, MAX_RESUME_BYTES)
+            staged.append((resume_path, resume.filename or "resume.pdf"))
+
+        if resumes_zip is not None:
+            zip_path = os.path.join(staging_path, "resumes.zip")
+            await save_upload(resumes_zip, zip_path, MAX_BATCH_UPLOAD_BYTES)
+            extracted, rejected = await run_in_threadpool(extract_batch_zip, zip_path, staging_path,
+                                                          MAX_BATCH_RESUMES - len(staged))
+            staged.extend(extracted)
+
+        members = await run_in_threadpool(create_staged_candidates, template_id, staged)
+    finally:
+        await run_in_threadpool(shutil.rmtree, staging_path, True)
+
+    await run_in_threadpool(create_batch, batch_id, [(candidate_id, filename) for candidate_id, _, filename in members],
+                            rejected)
+    jobs = await generation_pool.enqueue_many([(candidate_id, folder_path) for candidate_id, folder_path, _ in members])
+    return {
+        "batch_id": batch_id,
+        "template_id": template_id,
+        "candidates": [
+            {"candidate_id": candidate_id, "filename": filename, "job_id": job.id}
+            for (candidate_id, _, filename), job in zip(members, jobs)
+        ],
+        "rejected": rejected,
+        "status_url": f"/batches/{batch_id}",
+    }
+
+@app.get("/batches/{batch_id}")
+async def batch_status(batch_id: str):
+    status = await run_in_threadpool(get_batch_status, batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return status
+
+@app.get("/generation_status/{candidate_id}")
+async def generation_status(candidate_id: str):
+    job = await run_in_threadpool(get_latest_job, candidate_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No generation job found for candidate.")
+    status = job.to_dict()
+    status["candidate_status"] = await run_in_threadpool(store.get_status, candidate_id)
+    return status
 
 @app.post("/upload_audio/{candidate_id}")
 async def upload_audio(candidate_id: str, audio: UploadFile = File(...)):
     file_location = os.path.join(STORAGE_DIR, candidate_id)
+    if not os.path.isdir(file_location):
+        raise HTTPException(status_code=404, detail="Candidate not found.")
 
-    file_location = os.path.join(file_location, audio.filename)
-    with open(file_location, "wb") as f:
-        shutil.copyfileobj(audio.file, f)
+    await save_audio(audio, file_location, audio_extension(audio.filename))
 
     return {"message": "Audio uploaded successfully!"}
 
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/skill_cache/stats")
+async def get_skill_cache_stats():
+    return skill_cache.stats()
+
+@app.get("/exam_cache/stats")
+async def get_exam_cache_stats():
+    return exam_cache.stats()
+
+@app.get("/answer_log/stats")
+async def get_answer_log_stats():
+    return answer_log.stats()
+
+@app.get("/get_exam/{candidate_id}")
+async def get_exam(candidate_id: str, request: Request, wait: float = 0, section: Optional[str] = None):
+    # The candidate-facing exam in one response: holds until `section` (or every section) is published
+    # or `wait` runs out, then returns what is published so far and lists the rest as pending
+    if section is not None and section not in EXAM_SECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+    keys = [EXAM_SECTIONS[section]] if section else list(EXAM_SECTIONS.values())
+    try:
+        data = await wait_for_test_sections(candidate_id, keys, wait)
+    except HTTPException as e:
+        if e.status_code != 202:
+            raise
+        data = await run_in_threadpool(load_test_section, candidate_id, ())
+        if not any(key in data for key in EXAM_SECTIONS.values()):
+            raise
+
+    body = encode_bundle(candidate_exam_view(candidate_id, data, EXAM_SECTIONS))
+    encoding = choose_encoding(request.headers.get("accept-encoding"), len(body))
+    etag = bundle_etag(body, encoding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != IDENTITY:
+        body = await run_in_threadpool(compress, body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+def answer_key(candidate_id: str, section_key: str, answer_field: str) -> dict:
+    # Question text -> the answer stored with the generated exam
+    try:
+        data = load_test_output(os.path.join(STORAGE_DIR, candidate_id))
+    except HTTPException:
+        return {}
+    return {question["question"]: question.get(answer_field) for question in data.get(section_key, [])}
+
+def attach_stored_answers(answers: List[dict], key: dict, field: str) -> List[dict]:
+    # Answers only ever come from the stored exam, never from the client. Items whose question is
+    # not in the exam are dropped, as are repeats of a question: its first answer counts.
+    attached, seen = [], set()
+    for answer in answers:
+        question = answer["question"]
+        if question in key and question not in seen:
+            seen.add(question)
+            attached.append({**answer, field: key[question]})
+    return attached
+
+# --- Answer Autosave ---
+
+# Fields an autosave carries per section, named as in the section files
+AUTOSAVE_FIELDS = {"mcq": ("submitted_answer",), "theory": ("submitted_answer",),
+                   "coding": ("submitted_code", "language")}
+# Document each section's final submit writes; autosaves stop being accepted once it exists
+SUBMITTED_DOCUMENTS = {"mcq": "testoutput/submitted_mcq_answers.json", "theory": "testoutput/theory_answers.json",
+                       "coding": "testoutput/coding_answers.json"}
+# (question field, answer field) that pair a submitted answer with its exam question
+ANSWER_QUESTION_FIELDS = {"mcq": ("question", "question"), "theory": ("question", "question"),
+                          "coding": ("name", "question_name")}
+
+class AutosaveRequest(BaseModel):
+    # Increases with every edit of the question on the client; the highest one is kept
+    revision: int
+    submitted_answer: Optional[str] = None
+    submitted_code: Optional[str] = None
+    language: Optional[str] = None
+
+@app.put("/answers/{candidate_id}/{section}/{question_index}")
+async def autosave_answer(candidate_id: str, section: str, question_index: int, data: AutosaveRequest,
+                          idempotency_key: Optional[str] = Header(None)):
+    if section not in EXAM_SECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+    if question_index < 0:
+        raise HTTPException(status_code=400, detail="Question index must not be negative.")
+    if not os.path.isdir(os.path.join(STORAGE_DIR, candidate_id)):
+        raise HTTPException(status_code=404, detail="Candidate not found.")
+    if await run_in_threadpool(store.has_document, candidate_id, SUBMITTED_DOCUMENTS[section]):
+        # The submitted section file is final, a later draft would never be seen again
+        raise HTTPException(status_code=409, detail=f"The {section} section has already been submitted.")
+    answer = {field: getattr(data, field) for field in AUTOSAVE_FIELDS[section]}
+    try:
+        saved = await answer_log.append_answer(candidate_id, section, question_index, data.revision, answer,
+                                               idempotency_key)
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save answer: {str(e)}")
+    # Not saved again when the idempotency key shows an earlier attempt already was
+    return {"saved": saved, "duplicate": not saved}
+
+@app.get("/answers/{candidate_id}")
+async def get_draft_answers(candidate_id: str):
+    # The latest autosave of every question not yet submitted, to restore an interrupted exam
+    if not os.path.isdir(os.path.join(STORAGE_DIR, candidate_id)):
+        raise HTTPException(status_code=404, detail="Candidate not found.")
+    draft = await run_in_threadpool(answer_log.replay, candidate_id)
+    answers = {
+        section: {index: {**record["answer"], "revision": record["revision"]} for index, record in records.items()}
+        for section, records in draft["answers"].items()
+    }
+    return {"answers": answers, "submitted": draft["submitted"]}
+
+def draft_answer(section: str, question: dict, draft: dict) -> dict:
+    # A section-file entry built from an autosaved answer
+    if section == "coding":
+        return {"question_name": question["name"], "question_description": question["description"],
+                "submitted_code": draft.get("submitted_code") or "", "language": draft.get("language") or "python"}
+    answer = {"question": question["question"], "submitted_answer": draft.get("submitted_answer") or ""}
+    if section == "mcq":
+        answer["options"] = question["options"]
+    return answer
+
+def merge_draft_answers(candidate_id: str, section: str, submitted: List[dict]) -> List[dict]:
+    # Final submit folds the autosave log into the section: answers sent with the request win,
+    # questions it leaves out are taken from their latest autosave
+    drafts = answer_log.replay(candidate_id)["answers"].get(section)
+    if not drafts:
+        return submitted
+    try:
+        exam = load_test_output(os.path.join(STORAGE_DIR, candidate_id)).get(EXAM_SECTIONS[section], [])
+    except HTTPException:
+        return submitted
+    question_field, answer_field = ANSWER_QUESTION_FIELDS[section]
+    sent = {answer[answer_field]: answer for answer in submitted}
+    merged = []
+    for index, question in enumerate(exam):
+        answer = sent.pop(question[question_field], None)
+        if answer is None and index in drafts:
+            answer = draft_answer(section, question, drafts[index]["answer"])
+        if answer is not None:
+            merged.append(answer)
+    return merged + list(sent.values())
+
+async def compact_answer_log(candidate_id: str, section: str):
+    # The section file now holds the answers; a failure here must not fail the submit
+    try:
+        await answer_log.compact(candidate_id, section, EXAM_SECTIONS)
+    except OSError as e:
+        logger.warning("Compacting the answer log of %s after submitting %s failed: %s", candidate_id, section, e)
+
 @app.get("/get_mcq/{candidate_id}")
-async def get_mcq(candidate_id: str):
-    folder_path = os.path.join(STORAGE_DIR, candidate_id)
-    if not os.path.exists(os.path.join(folder_path, "testoutput.json")):
-        raise HTTPException(status_code=202, detail="Test generation in progress. Please retry.")
-    data = load_test_output(folder_path)
+async def get_mcq(candidate_id: str, wait: float = 0):
+    data = await wait_for_test_section(candidate_id, "questions", wait)
     try:
-        question = data["questions"]
-        return question
+        # Without the answers, like the exam bundle
+        return candidate_questions("questions", data["questions"])
     except (IndexError, KeyError):
         raise HTTPException(status_code=404, detail="MCQs not found or improperly generated.")
 
@@ -371,32 +841,31 @@ async def get_mcq(candidate_id: str):
 @app.post("/submit_all_mcq_answers/")
 async def submit_all_mcq_answers(data: SubmitMCQRequest):
     candidate_id = data.candidate_id
-    submitted_mcqs = data.submitted_mcqs
-    output_folder = os.path.join(STORAGE_DIR, candidate_id, "testoutput")
-    os.makedirs(output_folder, exist_ok=True)
-    mcq_answers_path = os.path.join(output_folder, "submitted_mcq_answers.json")
+    submitted_mcqs = await run_in_threadpool(merge_draft_answers, candidate_id, "mcq",
+                                             [mcq.dict() for mcq in data.submitted_mcqs])
+    submitted_mcqs = attach_stored_answers(
+        submitted_mcqs, await run_in_threadpool(answer_key, candidate_id, "questions", "answer"), "correct_answer")
     # Save the submitted answers into mcq_answers.json
     try:
-        with open(mcq_answers_path, "w") as f:
-            json.dump([mcq.dict() for mcq in submitted_mcqs], f, indent=4)
+        await run_in_threadpool(store.save_document, candidate_id, SUBMITTED_DOCUMENTS["mcq"],
+                                submitted_mcqs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save MCQ answers: {str(e)}")
+    await compact_answer_log(candidate_id, "mcq")
     return {"message": "All MCQ answers submitted successfully!"}
 
 @app.get("/get_theory_question/{candidate_id}")
-async def get_theory_question(candidate_id: str):
-    folder_path = os.path.join(STORAGE_DIR, candidate_id)
-    data = load_test_output(folder_path)
+async def get_theory_question(candidate_id: str, wait: float = 0):
+    data = await wait_for_test_section(candidate_id, "therotical_questions", wait)
     try:
-        theory = data["therotical_questions"]
-        return theory
+        return candidate_questions("therotical_questions", data["therotical_questions"])
     except IndexError:
         raise HTTPException(status_code=404, detail="Coding question not found")
 
 class TheoryAnswer(BaseModel):
     question: str
     submitted_answer: str
-    expected_answer: str
+    expected_answer: Optional[str] = None
 class SubmitTheoryRequest(BaseModel):
     candidate_id: str
     submitted_theory_questions: List[TheoryAnswer]
@@ -405,24 +874,26 @@ class SubmitTheoryRequest(BaseModel):
 @app.post("/submit_all_theory_answers/")
 async def submit_all_theory_answers(data: SubmitTheoryRequest):
     candidate_id = data.candidate_id
-    submitted_theory_questions = data.submitted_theory_questions
-    output_folder = os.path.join(STORAGE_DIR, candidate_id, "testoutput")
-    os.makedirs(output_folder, exist_ok=True)
-    theory_answers_path = os.path.join(output_folder, "theory_answers.json")
+    submitted_theory_questions = await run_in_threadpool(
+        merge_draft_answers, candidate_id, "theory", [theory.dict() for theory in data.submitted_theory_questions])
+    submitted_theory_questions = attach_stored_answers(
+        submitted_theory_questions,
+        await run_in_threadpool(answer_key, candidate_id, "therotical_questions", "expected_answer"),
+        "expected_answer")
     try:
-        with open(theory_answers_path, "w") as f:
-            json.dump([theory.dict() for theory in submitted_theory_questions], f, indent=4)
+        await run_in_threadpool(store.save_document, candidate_id, SUBMITTED_DOCUMENTS["theory"],
+                                submitted_theory_questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save theory answers: {str(e)}")
+    await compact_answer_log(candidate_id, "theory")
     return {"message": "All theory answers submitted successfully!"}
 
 @app.get("/get_coding_question/{candidate_id}")
-async def get_coding_question(candidate_id: str):
-    folder_path = os.path.join(STORAGE_DIR, candidate_id)
-    data = load_test_output(folder_path)
+async def get_coding_question(candidate_id: str, wait: float = 0):
+    data = await wait_for_test_section(candidate_id, "coding_question", wait)
     try:
-        coding = data["coding_question"]
-        return coding
+        # Hidden test cases stay on the server
+        return candidate_questions("coding_question", data["coding_question"])
     except IndexError:
         raise HTTPException(status_code=404, detail="Coding question not found")
 
@@ -438,19 +909,39 @@ class SubmitCodingRequest(BaseModel):
 @app.post("/submit_all_coding_answers/")
 async def submit_all_coding_answers(data: SubmitCodingRequest):
     candidate_id = data.candidate_id
-    submitted_coding_questions = data.submitted_coding_questions
-    output_folder = os.path.join(STORAGE_DIR, candidate_id, "testoutput")
-    os.makedirs(output_folder, exist_ok=True)
-    coding_answers_path = os.path.join(output_folder, "coding_answers.json")
+    submitted_coding_questions = await run_in_threadpool(
+        merge_draft_answers, candidate_id, "coding", [coding.dict() for coding in data.submitted_coding_questions])
     try:
-        with open(coding_answers_path, "w") as f:
-            json.dump([coding.dict() for coding in submitted_coding_questions], f, indent=4)
+        await run_in_threadpool(store.save_document, candidate_id, SUBMITTED_DOCUMENTS["coding"],
+                                submitted_coding_questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save coding answers: {str(e)}")
+
+    # Run every solution against the generated test cases
+    test_output = await run_in_threadpool(load_test_output, os.path.join(STORAGE_DIR, candidate_id))
+    with stage("coding_grading", candidate_id):
+        coding_results = await grade_coding_answers(submitted_coding_questions,
+                                                    test_output.get("coding_question", []))
+    await run_in_threadpool(store.save_document, candidate_id, "testoutput/coding_results.json", coding_results)
+    await compact_answer_log(candidate_id, "coding")
     return {"message": "All coding answers submitted successfully!"}
+
+@app.get("/coding_results/{candidate_id}")
+async def get_coding_results(candidate_id: str):
+    return await run_in_threadpool(load_json, os.path.join(STORAGE_DIR, candidate_id, "testoutput", "coding_results.json"))
 def load_json(filepath):
-    with open(filepath, "r") as f:
-        return json.load(f)
+    candidate_id, name = document_ref(filepath)
+    try:
+        return store.load_document(candidate_id, name)
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail=f"{name} not found for candidate.")
+
+def load_optional_json(filepath):
+    candidate_id, name = document_ref(filepath)
+    try:
+        return store.load_document(candidate_id, name)
+    except DocumentNotFound:
+        return None
 def build_consolidated_json(profile, mcq_answers, coding_answers, theory_answers):
     # Calculate is_correct for each MCQ
     mcq_results = []
@@ -471,8 +962,66 @@ def build_consolidated_json(profile, mcq_answers, coding_answers, theory_answers
     }
     return consolidated
 
-@app.post("/generate_final_result/")
-async def generate_final_result(candidate_id: str):
+def collect_result_entries(candidate_id: str):
+    storage_path = os.path.join(STORAGE_DIR, candidate_id)
+    entries = []
+    documents = set(store.list_documents(candidate_id))
+    for name in sorted(documents):
+        document = store.export_document(candidate_id, name)
+        entries.append(document_entry(name, document.data, document.version))
+    if "exam_template.json" in documents and "job_desc.json" not in documents:
+        # The JD lives with its template, include it the way per-candidate copies used to be
+        job_description, template_id = load_job_description(candidate_id)
+        entries.append(document_entry("job_desc.json", json.dumps(job_description, indent=2).encode("utf-8"),
+                                      template_id))
+    # Uploaded binaries (resume, audio) always live in the candidate folder
+    for foldername, subfolders, filenames in os.walk(storage_path):
+        subfolders.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(foldername, filename)
+            arcname = os.path.relpath(file_path, storage_path).replace(os.sep, "/")
+            if (arcname in documents or filename.endswith(('.zip', '.tmp', '.part'))
+                    or filename in (FileSystemStore.STATUS_FILE, ANSWER_LOG_NAME)):
+                continue  # Skip old on-disk archives and bookkeeping files
+            entries.append(file_entry(file_path, arcname))
+    return entries
+
+def load_scoring_inputs(candidate_id: str):
+    storage_path = os.path.join(STORAGE_DIR, candidate_id)
+    testoutput_path = os.path.join(storage_path, "testoutput")
+    job_description, _ = load_job_description(candidate_id)
+    return (
+        job_description.get("test_details", {}),
+        answer_key(candidate_id, "questions", "answer"),
+        load_optional_json(os.path.join(testoutput_path, "submitted_mcq_answers.json")),
+        load_optional_json(os.path.join(testoutput_path, "theory_answers.json")),
+        load_optional_json(os.path.join(testoutput_path, "coding_results.json")),
+    )
+
+def calculate_scores(candidate_id: str, inputs=None, theory_similarities=None) -> dict:
+    # Deterministic marks from the submitted answers and the marks scheme in the job description
+    scores = compute_scores(*(inputs or load_scoring_inputs(candidate_id)), theory_similarities)
+    store.save_document(candidate_id, "testoutput/scores.json", scores)
+    return scores
+
+def rescore_cohort(candidate_ids: List[str]) -> dict:
+    # Theory answers of every candidate are scored in a single vectorized batch
+    inputs = {}
+    errors = {}
+    for candidate_id in candidate_ids:
+        try:
+            inputs[candidate_id] = load_scoring_inputs(candidate_id)
+        except HTTPException as e:
+            errors[candidate_id] = e.detail
+    similarities = cohort_similarities([theory or [] for _, _, _, theory, _ in inputs.values()])
+    results = {}
+    for (candidate_id, candidate_inputs), theory_similarities in zip(inputs.items(), similarities):
+        scores = calculate_scores(candidate_id, candidate_inputs, theory_similarities)
+        results[candidate_id] = {"obtained": scores["obtained"], "total": scores["total"],
+                                 "percentage": scores["percentage"], "pending": scores.get("pending", 0)}
+    return {"rescored": results, "errors": errors}
+
+def load_report_inputs(candidate_id: str):
     storage_path = os.path.join(STORAGE_DIR, candidate_id)
     testoutput_path = os.path.join(storage_path, "testoutput")
 
@@ -486,70 +1035,155 @@ async def generate_final_result(candidate_id: str):
     coding_answers = load_json(coding_answers_path)
     theory_answers = load_json(theory_answers_path)
 
-    job_description_path = os.path.join(storage_path, "job_desc.json")
-    job_description = load_exam_details(job_description_path)
     # Build Consolidated JSON
+    # The report gets the grader's scored summary rather than the raw code, when there is one
+    if store.has_document(candidate_id, "testoutput/coding_results.json"):
+        coding_answers = summarize_coding_results(load_json(os.path.join(testoutput_path, "coding_results.json")))
+    scores = calculate_scores(candidate_id)
+    # Only the theory answers the local scorer found borderline are sent to the model
+    theory_scores = scores["sections"]["theory"]["questions"]
+    theory_answers = [
+        {"question_number": i + 1, **answer}
+        for i, (answer, score) in enumerate(zip(theory_answers, theory_scores)) if score["needs_review"]
+    ]
     final_data = build_consolidated_json(profile, mcq_answers, coding_answers, theory_answers)
+    return profile, final_data, scores
 
-    # Call LLM to generate final report text
-    final_report_text = await call_llm_to_generate_report(final_data, job_description["test_details"])
+def save_final_report(candidate_id: str, final_report_text: str):
+    store.save_document(candidate_id, "testoutput/Final_Report.txt", final_report_text)
+    store.set_status(candidate_id, STATUS_COMPLETED)
 
-    # Save the final report text
-    final_report_path = os.path.join(testoutput_path, "Final_Report.txt")
-    with open(final_report_path, "w") as f:
-        f.write(final_report_text.content)
+def final_marks_text(scores: dict) -> str:
+    # The closing "Marks: Obtained/Total" line is always the locally computed one
+    return f"\n\n{marks_line(scores)}"
 
+def final_result_info(candidate_id: str, profile: dict, scores: dict) -> dict:
     # Prepare candidate name safely
     candidate_name = profile.get("name", "Candidate").replace(" ", "_")
 
-    # Now create ZIP file
-    zip_filename = os.path.join(storage_path, f"{candidate_name}.zip")
-    with zipfile.ZipFile(zip_filename, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for foldername, subfolders, filenames in os.walk(storage_path):
-            for filename in filenames:
-                if not filename.endswith('.zip'):  # Avoid including the zip itself
-                    file_path = os.path.join(foldername, filename)
-                    arcname = os.path.relpath(file_path, storage_path)
-                    zipf.write(file_path, arcname)
-
+    # The ZIP itself is assembled on the fly by /download_zip/
     return {
-        "message": "Final result ZIP generated successfully!",
-        "zip_path": zip_filename,
-        "candidate_name": candidate_name
+        "message": "Final result generated successfully!",
+        "download_url": f"/download_zip/?candidate_id={candidate_id}",
+        "candidate_name": candidate_name,
+        "scores": scores
     }
 
+@app.get("/scores/{candidate_id}")
+async def get_scores(candidate_id: str):
+    # Served without any LLM call
+    return await run_in_threadpool(calculate_scores, candidate_id)
+
+class RescoreRequest(BaseModel):
+    candidate_ids: List[str]
+
+@app.post("/scores/rescore")
+async def rescore(data: RescoreRequest):
+    # Recomputes stored scores for many candidates at once, without any LLM call
+    return await run_in_threadpool(rescore_cohort, data.candidate_ids)
+
+@app.post("/generate_final_result/")
+async def generate_final_result(candidate_id: str):
+    with stage("report_inputs", candidate_id):
+        profile, final_data, scores = await run_in_threadpool(load_report_inputs, candidate_id)
+
+    # Call LLM to generate final report text
+    with stage("report_llm", candidate_id):
+        final_report_text = await call_llm_to_generate_report(final_data, scores)
+
+    # Save the final report text
+    with stage("report_save", candidate_id):
+        await run_in_threadpool(save_final_report, candidate_id,
+                                final_report_text.content.rstrip() + final_marks_text(scores))
+
+    return final_result_info(candidate_id, profile, scores)
+
+def sse_event(event: str, data) -> str:
+    # JSON-encoded payloads keep newlines in the report text inside a single data line
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/stream_final_result/")
+async def stream_final_result(candidate_id: str):
+    # Same as /generate_final_result/, but report tokens are sent as server-sent events while the
+    # model writes them. Final_Report.txt is persisted once the stream has completed.
+    with stage("report_inputs", candidate_id):
+        profile, final_data, scores = await run_in_threadpool(load_report_inputs, candidate_id)
+    info = final_result_info(candidate_id, profile, scores)
+
+    async def events():
+        yield sse_event("start", {"candidate_name": info["candidate_name"]})
+        parts = []
+        start = time.perf_counter()
+        try:
+            with stage("report_llm_stream", candidate_id):
+                async for token in stream_llm_report(final_data, scores):
+                    if not parts:
+                        metrics.observe("report_first_token_seconds", time.perf_counter() - start)
+                    parts.append(token)
+                    yield sse_event("token", token)
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Report generation failed: {e}"})
+            return
+        marks_text = final_marks_text(scores)
+        yield sse_event("token", marks_text)
+        with stage("report_save", candidate_id):
+            await run_in_threadpool(save_final_report, candidate_id, "".join(parts).rstrip() + marks_text)
+        yield sse_event("done", info)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/download_zip/")
-async def download_zip(candidate_id: str):
+async def download_zip(candidate_id: str, request: Request):
     storage_path = os.path.join(STORAGE_DIR, candidate_id)
     testoutput_path = os.path.join(storage_path, "testoutput")
 
     # Load profile to get candidate name
     profile_path = os.path.join(testoutput_path, "profile.json")
-    profile = load_json(profile_path)
+    profile = await run_in_threadpool(load_json, profile_path)
     candidate_name = profile.get("name", "Candidate").replace(" ", "_")
 
-    zip_path = os.path.join(storage_path, f"{candidate_name}.zip")
+    if not await run_in_threadpool(store.has_document, candidate_id, "testoutput/Final_Report.txt"):
+        raise HTTPException(status_code=404, detail="Final result not found. Please generate it first.")
 
-    if not os.path.exists(zip_path):
-        return {"error": "ZIP file not found. Please generate it first."}
+    with stage("zip_collect", candidate_id):
+        entries = await run_in_threadpool(collect_result_entries, candidate_id)
+    etag = archive_etag(entries)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": attachment_disposition(f"{candidate_name}.zip"),
+    }
 
-    return FileResponse(
-        path=zip_path,
-        filename=f"{candidate_name}.zip",
-        media_type='application/zip'
-    )
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        length = await run_in_threadpool(archive_lengths.get_or_compute, etag, entries)
+        try:
+            byte_range = parse_range(range_header, length)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{length}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(timed_iter("zip_stream", iter_range(iter_zip(entries), start, end), candidate_id),
+                                     status_code=206,
+                                     media_type="application/zip", headers=headers)
+
+    return StreamingResponse(timed_iter("zip_stream", iter_zip(entries), candidate_id), media_type="application/zip",
+                             headers=headers)
 
 @app.get("/get_final_report/")
 async def get_final_report(candidate_id: str):
-    storage_path = os.path.join(STORAGE_DIR, candidate_id, "testoutput")
-    final_report_path = os.path.join(storage_path, "Final_Report.txt")
-
-    if not os.path.exists(final_report_path):
+    try:
+        report_text = await run_in_threadpool(store.load_document, candidate_id, "testoutput/Final_Report.txt")
+    except DocumentNotFound:
         raise HTTPException(status_code=404, detail="Final report not found. Please generate it first.")
 
-    with open(final_report_path, "r", encoding="utf-8") as f:
-        report_text = f.read()
-
     return {
         "candidate_id": candidate_id,
         "final_report": report_text
@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Per-candidate JSON-lines event logs are written here when set
+METRICS_LOG_DIR = os.environ.get("METRICS_LOG_DIR")
+
+# USD per million tokens, for the cost estimate (defaults: gemini-2.0-flash list prices)
+LLM_INPUT_COST_PER_MTOK = float(os.environ.get("LLM_INPUT_COST_PER_MTOK", 0.10))
+LLM_OUTPUT_COST_PER_MTOK = float(os.environ.get("LLM_OUTPUT_COST_PER_MTOK", 0.40))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    # In-process counters and histograms rendered in the Prometheus text exposition format.
+    # Each worker process keeps its own; scrape every worker or run a single one.
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = defaultdict(dict)
+        self._lock = Lock()
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.sum += value
+            histogram.count += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name: str, kind: str):
+        kind, help_text = self._help.get(name, (kind, ""))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+metrics = MetricsRegistry()
+metrics.describe("stage_duration_seconds", "histogram", "Duration of pipeline stages.")
+metrics.describe("stage_total", "counter", "Pipeline stage runs by outcome.")
+metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route.")
+metrics.describe("http_requests_total", "counter", "HTTP requests by route and status code.")
+metrics.describe("llm_calls_total", "counter", "LLM calls by stage and outcome.")
+metrics.describe("llm_tokens_total", "counter", "LLM tokens by stage and kind (prompt or completion).")
+metrics.describe("llm_retries_total", "counter", "LLM call retries.")
+metrics.describe("llm_cost_usd_total", "counter", "Estimated LLM cost in USD.")
+metrics.describe("report_first_token_seconds", "histogram", "Time to the first streamed report token.")
+metrics.describe("generation_jobs_total", "counter", "Finished generation job attempts by resulting status.")
+metrics.describe("skill_cache_lookups_total", "counter", "Skill cache lookups by result.")
+
+
+# --- Per-candidate Event Log ---
+
+_log_lock = Lock()
+
+
+def log_candidate_event(candidate_id: Optional[str], event: str, **fields):
+    if not METRICS_LOG_DIR or not candidate_id:
+        return
+    record = {"ts": round(time.time(), 3), "candidate_id": candidate_id, "event": event, **fields}
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with _log_lock:
+        os.makedirs(METRICS_LOG_DIR, exist_ok=True)
+        with open(os.path.join(METRICS_LOG_DIR, f"{candidate_id}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+# --- Stage Spans ---
+
+@contextmanager
+def stage(name: str, candidate_id: Optional[str] = None):
+    # Times a pipeline stage; works around sync and async code alike
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", seconds, stage=name)
+        metrics.inc("stage_total", stage=name, outcome=outcome)
+        log_candidate_event(candidate_id, "stage", stage=name, seconds=round(seconds, 4), outcome=outcome)
+
+
+def timed_iter(name: str, chunks: Iterator, candidate_id: Optional[str] = None) -> Iterator:
+    # A stage that lasts as long as a streamed response body
+    with stage(name, candidate_id):
+        yield from chunks
+
+
+# --- HTTP Latency ---
+
+class MetricsMiddleware:
+    # Labels requests with the matched route template, so ids in paths don't explode cardinality
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            labels = dict(method=scope["method"], route=path)
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, **labels)
+            metrics.inc("http_requests_total", status=status_code, **labels)
+
+
+# --- LLM Usage ---
+
+def _stage_from_tags(tags) -> str:
+    for tag in tags or ():
+        if tag.startswith("stage:"):
+            return tag[len("stage:"):]
+    return "unknown"
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    # Reads token usage from the model's usage_metadata; chains are tagged "stage:<name>"
+
+    def on_llm_end(self, response, *, tags=None, **kwargs):
+        stage_name = _stage_from_tags(tags)
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        metrics.inc("llm_calls_total", stage=stage_name, outcome="ok")
+        metrics.inc("llm_tokens_total", prompt_tokens, stage=stage_name, kind="prompt")
+        metrics.inc("llm_tokens_total", completion_tokens, stage=stage_name, kind="completion")
+        cost = (prompt_tokens * LLM_INPUT_COST_PER_MTOK + completion_tokens * LLM_OUTPUT_COST_PER_MTOK) / 1e6
+        metrics.inc("llm_cost_usd_total", cost, stage=stage_name)
+
+    def on_llm_error(self, error, *, tags=None, **kwargs):
+        metrics.inc("llm_calls_total", stage=_stage_from_tags(tags), outcome="error")
+
+    def on_retry(self, retry_state, *, tags=None, **kwargs):
+        metrics.inc("llm_retries_total", stage=_stage_from_tags(tags))
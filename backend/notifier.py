@@ -0,0 +1,29 @@
+import asyncio
+import weakref
+
+
+class CandidateNotifier:
+    # Wakes requests that are long-polling a candidate as soon as generation publishes something.
+    # Events are only kept alive by their waiters, so idle candidates cost nothing.
+
+    def __init__(self):
+        self._events = weakref.WeakValueDictionary()
+
+    def watch(self, candidate_id: str) -> asyncio.Event:
+        # Take the event *before* checking state so a publish in between is not missed
+        event = self._events.get(candidate_id)
+        if event is None:
+            event = asyncio.Event()
+            self._events[candidate_id] = event
+        return event
+
+    def notify(self, candidate_id: str):
+        event = self._events.pop(candidate_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, event: asyncio.Event, timeout: float):
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import List, Optional
+
+import PyPDF2
+
+# Below this many pages, spinning work out to other processes costs more than it saves
+PARALLEL_PAGE_THRESHOLD = int(os.environ.get("PDF_PARALLEL_PAGE_THRESHOLD", 8))
+PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 4))
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class ResumeParseError(Exception):
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def get_pdf_executor() -> Optional[ProcessPoolExecutor]:
+    # With a single worker the pool would only add inter-process overhead
+    global _executor
+    if PDF_WORKERS < 2:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Spawned, not forked: by the time the first large resume arrives the process runs
+                # the gRPC client and its threads, which a forked child would inherit mid-flight
+                _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _discard_pdf_executor(executor: ProcessPoolExecutor):
+    # A worker died (e.g. on a PDF that crashes the parser); the pool is unusable from then on
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process, which opens its own reader
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_pdf_text(pdf_path: str, executor: Optional[ProcessPoolExecutor] = None) -> str:
+    try:
+        reader = PyPDF2.PdfReader(pdf_path)
+        page_count = len(reader.pages)
+        if executor is None or page_count < PARALLEL_PAGE_THRESHOLD:
+            parts = [page.extract_text() or "" for page in reader.pages]
+        else:
+            futures = [
+                executor.submit(_extract_page_range, pdf_path, start, min(start + PAGES_PER_TASK, page_count))
+                for start in range(0, page_count, PAGES_PER_TASK)
+            ]
+            parts = [text for future in futures for text in future.result()]
+    except BrokenProcessPool as e:
+        _discard_pdf_executor(executor)
+        raise ResumeParseError("Could not read resume PDF: the parser crashed on it.") from e
+    except Exception as e:
+        # Malformed PDFs surface as all kinds of errors from inside PyPDF2 (KeyError, TypeError,
+        # AttributeError, ...), none of which a retry would fix
+        raise ResumeParseError(f"Could not read resume PDF: {type(e).__name__}: {e}") from e
+
+    text = "".join(parts)
+    if not text.strip():
+        raise ResumeParseError("Resume PDF contains no extractable text (is it a scanned image?).")
+    return text
+
+
+def clean_resume_text(text):
+    # Replace multiple newlines and bullets
+    text = re.sub(r"[•\n]+", "\n", text)
+    # Remove leading/trailing whitespace
+    return text.strip()
+
+
+def load_resume_text(pdf_path: str, executor: Optional[ProcessPoolExecutor] = None) -> str:
+    # Cleaned text is kept next to the PDF so a resume is only ever parsed once
+    text_path = os.path.splitext(pdf_path)[0] + ".txt"
+    try:
+        if os.stat(text_path).st_mtime_ns >= os.stat(pdf_path).st_mtime_ns:
+            with open(text_path, "r", encoding="utf-8") as f:
+                return f.read()
+    except FileNotFoundError:
+        pass
+
+    text = clean_resume_text(extract_pdf_text(pdf_path, executor))
+    partial_path = text_path + ".part"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(partial_path, text_path)
+    return text
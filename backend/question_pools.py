@@ -0,0 +1,215 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import Float, String, Text, UniqueConstraint, func, or_, select, update
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, SessionLocal
+
+# Questions generated per skill and section when a pool is built
+QUESTION_POOL_PER_SKILL = int(os.environ.get("QUESTION_POOL_PER_SKILL", 5))
+# Skills a pool covers, mandatory ones first
+QUESTION_POOL_MAX_SKILLS = int(os.environ.get("QUESTION_POOL_MAX_SKILLS", 12))
+# A build that has not finished after this long is presumed dead and may be restarted
+QUESTION_POOL_BUILD_LEASE_SECONDS = float(os.environ.get("QUESTION_POOL_BUILD_LEASE_SECONDS", 3600))
+
+# Same split as the exam prompts: 60% of the questions on mandatory skills, 40% on important ones
+MANDATORY_WEIGHT = 0.6
+IMPORTANT_WEIGHT = 0.4
+
+# Field whose normalized text identifies a question, per section
+QUESTION_TEXT_FIELDS = {"mcq": "question", "theory": "question", "coding": "description"}
+
+# --- Pool States ---
+
+POOL_BUILDING = "building"
+POOL_READY = "ready"
+POOL_FAILED = "failed"
+
+
+class QuestionPool(Base):
+    __tablename__ = "question_pools"
+
+    template_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16))
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    started_at: Mapped[float] = mapped_column(Float)
+    finished_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+
+class PoolQuestion(Base):
+    __tablename__ = "pool_questions"
+    __table_args__ = (UniqueConstraint("template_id", "section", "text_hash"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    template_id: Mapped[str] = mapped_column(String(36), index=True)
+    section: Mapped[str] = mapped_column(String(16))
+    skill: Mapped[str] = mapped_column(String(256))
+    difficulty: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    text_hash: Mapped[str] = mapped_column(String(64))
+    question: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[float] = mapped_column(Float)
+
+
+def normalize_question_text(text: str) -> str:
+    # Case, punctuation and spacing differences don't make a new question
+    return " ".join(re.sub(r"[^\w]+", " ", text.casefold()).split())
+
+
+def question_hash(section: str, question: dict) -> str:
+    text = normalize_question_text(str(question.get(QUESTION_TEXT_FIELDS[section], "")))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pool_skills(analysis: dict) -> List[Tuple[str, str]]:
+    # (skill, kind) pairs, deduplicated case-insensitively, mandatory skills first
+    skills, seen = [], set()
+    for kind in ("mandatory", "important"):
+        for skill in analysis.get(f"{kind}_skills", []):
+            if skill.casefold() not in seen:
+                seen.add(skill.casefold())
+                skills.append((skill, kind))
+    return skills[:QUESTION_POOL_MAX_SKILLS]
+
+
+# --- Pool Table Access ---
+
+def start_pool_build(template_id: str) -> bool:
+    # Claims the build; False while another build of the same pool is still running
+    now = time.time()
+    with SessionLocal() as session:
+        if session.get(QuestionPool, template_id) is None:
+            session.add(QuestionPool(template_id=template_id, status=POOL_BUILDING, started_at=now))
+            session.commit()
+            return True
+        claimed = session.execute(
+            update(QuestionPool)
+            .where(QuestionPool.template_id == template_id,
+                   or_(QuestionPool.status != POOL_BUILDING,
+                       QuestionPool.started_at < now - QUESTION_POOL_BUILD_LEASE_SECONDS))
+            .values(status=POOL_BUILDING, error=None, started_at=now, finished_at=None)
+        ).rowcount
+        session.commit()
+        return bool(claimed)
+
+
+def finish_pool_build(template_id: str, error: Optional[str] = None):
+    # A pool with some questions is still usable when part of the build failed
+    with SessionLocal() as session:
+        (size,) = session.execute(
+            select(func.count()).select_from(PoolQuestion).where(PoolQuestion.template_id == template_id)
+        ).one()
+        status = POOL_READY if size else POOL_FAILED
+        session.execute(
+            update(QuestionPool)
+            .where(QuestionPool.template_id == template_id)
+            .values(status=status, error=error, finished_at=time.time())
+        )
+        session.commit()
+
+
+def add_pool_questions(template_id: str, section: str, skill: str, difficulty: Optional[str],
+                       questions: List[dict]) -> int:
+    # Returns how many were new; only one build runs per pool, so check-then-insert is safe
+    hashes = {}
+    for question in questions:
+        hashes.setdefault(question_hash(section, question), question)
+    now = time.time()
+    with SessionLocal() as session:
+        existing = set(session.scalars(
+            select(PoolQuestion.text_hash)
+            .where(PoolQuestion.template_id == template_id, PoolQuestion.section == section,
+                   PoolQuestion.text_hash.in_(list(hashes)))
+        ))
+        new = [
+            PoolQuestion(id=str(uuid4()), template_id=template_id, section=section, skill=skill,
+                         difficulty=difficulty, text_hash=text_hash, question=json.dumps(question), created_at=now)
+            for text_hash, question in hashes.items() if text_hash not in existing
+        ]
+        session.add_all(new)
+        session.commit()
+    return len(new)
+
+
+def get_pool_status(template_id: str) -> Optional[dict]:
+    with SessionLocal() as session:
+        pool = session.get(QuestionPool, template_id)
+        if pool is None:
+            return None
+        rows = session.execute(
+            select(PoolQuestion.section, PoolQuestion.skill, func.count())
+            .where(PoolQuestion.template_id == template_id)
+            .group_by(PoolQuestion.section, PoolQuestion.skill)
+        ).all()
+    sections: Dict[str, dict] = {}
+    for section, skill, count in rows:
+        entry = sections.setdefault(section, {"total": 0, "skills": {}})
+        entry["total"] += count
+        entry["skills"][skill] = count
+    return {
+        "template_id": template_id,
+        "status": pool.status,
+        "error": pool.error,
+        "started_at": pool.started_at,
+        "finished_at": pool.finished_at,
+        "sections": sections,
+    }
+
+
+def is_pool_ready(template_id: str) -> bool:
+    with SessionLocal() as session:
+        pool = session.get(QuestionPool, template_id)
+        return pool is not None and pool.status == POOL_READY
+
+
+def load_pool_questions(template_id: str, section: str) -> List[Tuple[str, str]]:
+    with SessionLocal() as session:
+        return session.execute(
+            select(PoolQuestion.skill, PoolQuestion.question)
+            .where(PoolQuestion.template_id == template_id, PoolQuestion.section == section)
+            .order_by(PoolQuestion.id)
+        ).all()
+
+
+# --- Sampling ---
+
+def skill_weights(analysis: dict) -> Dict[str, float]:
+    weights = {}
+    for kind, share in (("mandatory", MANDATORY_WEIGHT), ("important", IMPORTANT_WEIGHT)):
+        skills = [skill for skill, skill_kind in pool_skills(analysis) if skill_kind == kind]
+        for skill in skills:
+            weights[skill] = share / len(skills)
+    return weights
+
+
+def sample_pool_exam(template_id: str, analysis: dict, seed: str) -> Dict[str, List[dict]]:
+    # Draws each section's questions without replacement, weighted so skills are represented by
+    # their share however many pooled questions each one has. Sections the pool cannot fill are
+    # left out and generated per candidate as before. A fixed seed redraws the same exam.
+    rng = random.Random(seed)
+    weights = skill_weights(analysis)
+    exam = {}
+    for section, config in analysis.get("sections", {}).items():
+        count = config["no_of_questions"]
+        rows = load_pool_questions(template_id, section) if count > 0 else []
+        if len(rows) < count or not rows:
+            continue
+        per_skill = Counter(skill for skill, _ in rows)
+        fallback = min(weights.values(), default=1.0)
+
+        # Efraimidis-Spirakis: the largest u ** (1 / w) keys form a weighted sample. Compared as
+        # log(u) / w, the same order, since u ** (1 / w) underflows to 0 for the small weights of large pools.
+        def key(row):
+            weight = weights.get(row[0], fallback) / per_skill[row[0]]
+            return math.log(1.0 - rng.random()) / weight
+
+        exam[section] = [json.loads(question) for _, question in sorted(rows, key=key, reverse=True)[:count]]
+    return exam
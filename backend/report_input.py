@@ -0,0 +1,108 @@
+import json
+import logging
+import math
+import os
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the report prompt's data (answers and scores), in tokens
+REPORT_INPUT_TOKEN_BUDGET = int(os.environ.get("REPORT_INPUT_TOKEN_BUDGET", 6000))
+# Long text fields are cut to the first of these limits that brings the input within budget
+TEXT_LIMITS = (1200, 600, 300, 150, 80)
+
+CHARS_PER_TOKEN = 4
+PROFILE_FIELDS = ("name", "qualification", "technical_skills", "programming_languages", "skills_in_jd")
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic for Gemini/GPT-style tokenizers on English text and code, for when the
+    # model's own counter is not available
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _clip(text, limit: int):
+    if not isinstance(text, str) or len(text) <= limit:
+        return text
+    return text[:limit] + f"...[{len(text) - limit} chars cut]"
+
+
+def compact_report_input(final_data: dict, limit: int) -> dict:
+    # Only what the examiner needs to write feedback: marks are computed elsewhere, so MCQ
+    # options and correct answers the candidate matched anyway add nothing
+    profile = final_data.get("profile", {})
+    mcq_results = []
+    for mcq in final_data.get("mcq_results", []):
+        item = {"q": _clip(mcq["question"], limit), "correct": mcq["is_correct"]}
+        if not mcq["is_correct"]:
+            item["answered"] = _clip(mcq["submitted_answer"], limit)
+            item["expected"] = _clip(mcq["correct_answer"], limit)
+        mcq_results.append(item)
+
+    theory_results = [
+        {key: _clip(value, limit) for key, value in answer.items()}
+        for answer in final_data.get("theory_results", [])
+    ]
+    coding_results = []
+    for result in final_data.get("coding_results", []):
+        result = dict(result)
+        # Raw answers only reach the prompt when the grader has not run
+        result.pop("question_description", None)
+        if "submitted_code" in result:
+            result["submitted_code"] = _clip(result["submitted_code"], limit)
+        # Copies, the caller's tests keep their full text for the next, tighter pass
+        if "failed_tests" in result:
+            result["failed_tests"] = [
+                {**test, **{key: _clip(test[key], limit) for key in ("input", "expected_output", "output") if key in test}}
+                for test in result["failed_tests"]
+            ]
+        coding_results.append(result)
+
+    return {
+        "profile": {field: profile[field] for field in PROFILE_FIELDS if field in profile},
+        "mcq_results": mcq_results,
+        "theory_results": theory_results,
+        "coding_results": coding_results,
+    }
+
+
+def encode_report_input(final_data: dict, scores: dict, budget: int = REPORT_INPUT_TOKEN_BUDGET,
+                        count_tokens: Callable[[str], int] = estimate_tokens):
+    # Returns the compact JSON strings for the prompt's final_data and scores. `count_tokens` must
+    # be local (no request per call), every text is counted once.
+    counts = {}
+
+    def tokens_of(text: str) -> int:
+        if text not in counts:
+            counts[text] = count_tokens(text)
+        return counts[text]
+
+    scores_text = dumps(scores)
+    scores_tokens = tokens_of(scores_text)
+    for limit in TEXT_LIMITS:
+        data_text = dumps(compact_report_input(final_data, limit))
+        if tokens_of(data_text) + scores_tokens <= budget:
+            break
+    else:
+        # Still too large at the tightest limit: per-question details of the longest sections go
+        compact = compact_report_input(final_data, TEXT_LIMITS[-1])
+        compact["omitted"] = {}
+        for key in sorted(("mcq_results", "theory_results", "coding_results"), key=lambda k: -len(dumps(compact[k]))):
+            if tokens_of(dumps(compact)) + scores_tokens <= budget:
+                break
+            kept = max(1, len(compact[key]) // 4)
+            if kept < len(compact[key]):
+                compact["omitted"][key] = len(compact[key]) - kept
+                compact[key] = compact[key][:kept]
+        data_text = dumps(compact)
+        limit = 0
+
+    raw_tokens = estimate_tokens(str(final_data))
+    tokens = tokens_of(data_text) + scores_tokens
+    logger.info("Report input: %d tokens (uncompacted ~%d, budget %d, text limit %s)",
+                tokens, raw_tokens, budget, limit or "exceeded")
+    return data_text, scores_text
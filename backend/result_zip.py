@@ -0,0 +1,158 @@
+import hashlib
+import io
+import os
+import re
+import time
+import unicodedata
+import zipfile
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# Already-compressed formats are stored as-is, deflating them again only burns CPU
+STORED_EXTENSIONS = {".mp3", ".m4a", ".aac", ".ogg", ".opus", ".webm", ".mp4", ".wma",
+                     ".zip", ".gz", ".png", ".jpg", ".jpeg", ".pdf"}
+
+# Timestamp for entries that have no file on disk, so the archive bytes stay reproducible
+DOCUMENT_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class ZipEntry(NamedTuple):
+    arcname: str
+    path: Optional[str]  # a file on disk, or
+    data: Optional[bytes]  # an in-memory document
+    size: int
+    date_time: Tuple[int, int, int, int, int, int]
+    version: object
+
+    def iter_bytes(self, chunk_size: int) -> Iterator[bytes]:
+        if self.data is not None:
+            yield self.data
+            return
+        with open(self.path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+
+def file_entry(path: str, arcname: str) -> ZipEntry:
+    stat = os.stat(path)
+    date_time = time.localtime(max(stat.st_mtime, 315532800))[:6]  # ZIP cannot represent dates before 1980
+    return ZipEntry(arcname, path, None, stat.st_size, date_time, (stat.st_mtime_ns, stat.st_size))
+
+
+def document_entry(arcname: str, data: bytes, version) -> ZipEntry:
+    return ZipEntry(arcname, None, data, len(data), DOCUMENT_DATE_TIME, version)
+
+
+def archive_etag(entries: List[ZipEntry]) -> str:
+    # The archive is a pure function of its entries, so their names and versions identify its bytes
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(f"{entry.arcname}\0{entry.size}\0{entry.version!r}\n".encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def attachment_disposition(filename: str) -> str:
+    # The name comes from the resume, so it can be anything: an ASCII fallback for old clients
+    # plus the exact name percent-encoded per RFC 5987, as FileResponse does
+    stem, extension = os.path.splitext(filename)
+    ascii_stem = unicodedata.normalize("NFKD", stem).encode("ascii", "ignore").decode("ascii")
+    ascii_stem = re.sub(r"[^A-Za-z0-9._-]+", "_", ascii_stem).strip("._") or "download"
+    ascii_name = ascii_stem + re.sub(r"[^A-Za-z0-9.]", "", extension)
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+class _ChunkSink(io.RawIOBase):
+    # Unseekable target: zipfile then writes sizes in data descriptors instead of seeking back
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: List[ZipEntry], chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    # Builds the archive on the fly; memory use is bounded by the chunk size, not the file sizes
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.arcname, date_time=entry.date_time)
+            info.external_attr = 0o644 << 16
+            extension = os.path.splitext(entry.arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=entry.size >= zipfile.ZIP64_LIMIT) as target:
+                for block in entry.iter_bytes(chunk_size):
+                    target.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def iter_range(chunks: Iterator[bytes], start: int, end: int) -> Iterator[bytes]:
+    # Bytes start..end (inclusive) of the stream
+    offset = 0
+    for chunk in chunks:
+        chunk_end = offset + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - offset, 0):min(end + 1 - offset, len(chunk))]
+        offset = chunk_end
+        if offset > end:
+            return
+
+
+class ArchiveLengthCache:
+    # Range requests need the total length up front, which costs one dry run of the archive.
+    # Lengths are remembered per ETag so a resumed download only pays for it once.
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lengths = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_compute(self, etag: str, entries: List[ZipEntry]) -> int:
+        with self._lock:
+            if etag in self._lengths:
+                self._lengths.move_to_end(etag)
+                return self._lengths[etag]
+        length = sum(len(chunk) for chunk in iter_zip(entries))
+        with self._lock:
+            self._lengths[etag] = length
+            while len(self._lengths) > self.max_entries:
+                self._lengths.popitem(last=False)
+        return length
+
+
+def parse_range(header: str, length: int) -> Optional[Tuple[int, int]]:
+    # Single "bytes=" ranges only; anything else falls back to the full archive
+    if not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else length - 1
+        else:
+            start = max(length - int(last), 0)
+            end = length - 1
+    except ValueError:
+        return None
+    if start > end or start >= length:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, length - 1)
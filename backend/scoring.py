@@ -0,0 +1,156 @@
+from typing import List, Optional
+
+import numpy as np
+
+from theory_scorer import needs_review, score_fractions, similarity_scores
+
+# Keys accepted for the marks of a single question in job_description["test_details"]
+MARKS_PER_QUESTION_KEYS = ("marks_per_question", "marks_each", "mark_per_question", "marks", "mark")
+TOTAL_MARKS_KEYS = ("total_marks", "section_marks")
+DEFAULT_MARKS_PER_QUESTION = 1
+
+SECTIONS = ("mcq", "theory", "coding")
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_marks(value: float):
+    value = round(value, 2)
+    return int(value) if value == int(value) else value
+
+
+def section_config(test_details: dict, section: str, answered: int, stored: Optional[int] = None) -> dict:
+    # Sections are looked up case-insensitively ("MCQ", "Theory", "Coding", ...)
+    details = {}
+    for key, value in (test_details or {}).items():
+        if key.lower().startswith(section) and isinstance(value, dict):
+            details = value
+            break
+
+    # The number of questions the exam actually holds wins over the configured one
+    count = _number(details.get("no_of_questions"))
+    count = stored if stored is not None else int(count) if count else answered
+    marks = next((_number(details[key]) for key in MARKS_PER_QUESTION_KEYS if key in details), None)
+    if marks is None:
+        total = next((_number(details[key]) for key in TOTAL_MARKS_KEYS if key in details), None)
+        marks = total / count if total and count else DEFAULT_MARKS_PER_QUESTION
+    return {"no_of_questions": count, "marks_per_question": marks}
+
+
+def _section(questions: List[dict], config: dict) -> dict:
+    # Unanswered questions count towards the total with zero marks. Pending ones (not graded yet)
+    # count towards neither, their marks are not known.
+    pending = sum(1 for question in questions if question.get("pending"))
+    total = max(config["no_of_questions"] - pending, 0) * config["marks_per_question"]
+    obtained = sum(question["obtained"] for question in questions if not question.get("pending"))
+    section = {
+        "obtained": format_marks(min(obtained, total) if total else obtained),
+        "total": format_marks(total),
+        "marks_per_question": format_marks(config["marks_per_question"]),
+        "questions": questions,
+    }
+    if pending:
+        section["pending"] = pending
+    return section
+
+
+def score_mcq(mcq_key: dict, mcq_answers: List[dict], config: dict) -> dict:
+    # One result per question of the stored exam (question text -> stored answer), scored with at
+    # most one submitted answer each, so repeated or unknown items in the submission earn nothing
+    marks = config["marks_per_question"]
+    submitted = {}
+    for answer in mcq_answers:
+        submitted.setdefault(answer["question"], answer["submitted_answer"])
+    questions = []
+    for question, expected in mcq_key.items():
+        correct = question in submitted and submitted[question] == expected
+        questions.append({"is_correct": correct, "obtained": format_marks(marks if correct else 0),
+                          "max": format_marks(marks)})
+    section = _section(questions, config)
+    section["correct"] = sum(question["is_correct"] for question in questions)
+    return section
+
+
+def score_theory(theory_answers: List[dict], config: dict, similarities: Optional[np.ndarray] = None) -> dict:
+    # `similarities` can be precomputed when a whole cohort is scored in one batch
+    marks = config["marks_per_question"]
+    if similarities is None:
+        similarities = similarity_scores([answer["submitted_answer"] for answer in theory_answers],
+                                         [answer["expected_answer"] for answer in theory_answers])
+    # Half-mark steps, so near-identical answers get the same score
+    obtained = np.round(score_fractions(similarities) * marks * 2) / 2
+    review = needs_review(similarities)
+    questions = [
+        {"similarity": round(float(similarity), 3), "obtained": format_marks(float(points)),
+         "max": format_marks(marks), "needs_review": bool(flag)}
+        for similarity, points, flag in zip(similarities, obtained, review)
+    ]
+    return _section(questions, config)
+
+
+def score_coding(coding_results: List[dict], config: dict) -> dict:
+    # Marks in proportion to the test cases passed by the local grader. Solutions it could not run
+    # are pending: no marks either way until someone reviews them.
+    marks = config["marks_per_question"]
+    questions = []
+    for result in coding_results:
+        question = {"question_name": result["question_name"], "tests_passed": f"{result['passed']}/{result['total']}",
+                    "max": format_marks(marks)}
+        if result.get("graded", False) and result.get("total", 0) > 0:
+            question["obtained"] = format_marks(marks * result["passed"] / result["total"])
+        else:
+            question.update(obtained=None, pending=True, needs_review=True)
+        questions.append(question)
+    return _section(questions, config)
+
+
+def compute_scores(test_details: dict, mcq_key: Optional[dict], mcq_answers: Optional[List[dict]],
+                   theory_answers: Optional[List[dict]], coding_results: Optional[List[dict]],
+                   theory_similarities: Optional[np.ndarray] = None) -> dict:
+    # Sections without submitted answers score zero out of their configured total
+    answers = {"mcq": mcq_answers or [], "theory": theory_answers or [], "coding": coding_results or []}
+    configs = {section: section_config(test_details, section, len(answers[section])) for section in SECTIONS}
+    if mcq_key:
+        configs["mcq"] = section_config(test_details, "mcq", len(answers["mcq"]), len(mcq_key))
+    sections = {
+        "mcq": score_mcq(mcq_key or {}, answers["mcq"], configs["mcq"]),
+        "theory": score_theory(answers["theory"], configs["theory"], theory_similarities),
+        "coding": score_coding(answers["coding"], configs["coding"]),
+    }
+    obtained = sum(section["obtained"] for section in sections.values())
+    total = sum(section["total"] for section in sections.values())
+    scores = {
+        "sections": sections,
+        "obtained": format_marks(obtained),
+        "total": format_marks(total),
+        "percentage": round(100 * obtained / total, 1) if total else 0.0,
+    }
+    pending = sum(section.get("pending", 0) for section in sections.values())
+    if pending:
+        scores["pending"] = pending
+    return scores
+
+
+def marks_line(scores: dict) -> str:
+    line = f"Marks: {scores['obtained']}/{scores['total']}"
+    if scores.get("pending"):
+        line += f" ({scores['pending']} question(s) pending review, not included)"
+    return line
+
+
+def scores_for_prompt(scores: dict) -> dict:
+    # Section results and per-question marks, without the bookkeeping fields
+    return {
+        section: {
+            "obtained": data["obtained"],
+            "total": data["total"],
+            "question_marks": ["pending" if question.get("pending") else question["obtained"]
+                               for question in data["questions"]],
+        }
+        for section, data in scores["sections"].items()
+    } | {"obtained": scores["obtained"], "total": scores["total"]}
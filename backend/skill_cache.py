@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from threading import Lock
+
+
+def normalize_requirements(requirements) -> str:
+    # The same opening can arrive as differently formatted text or JSON; key on its content only
+    if not isinstance(requirements, str):
+        requirements = json.dumps(requirements, sort_keys=True, separators=(",", ":"))
+    return re.sub(r"\s+", " ", requirements).strip().casefold()
+
+
+def skill_cache_key(resume_text: str, requirements) -> str:
+    digest = hashlib.sha256()
+    digest.update(resume_text.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_requirements(requirements).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SkillCache:
+    # Persistent cache of skill-extraction results with TTL and LRU size eviction.
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float = 7 * 24 * 3600):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS skill_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_skill_cache_accessed ON skill_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM skill_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM skill_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE skill_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO skill_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM skill_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM skill_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM skill_cache WHERE key IN"
+                " (SELECT key FROM skill_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += expired + max(overflow, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM skill_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
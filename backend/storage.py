@@ -0,0 +1,278 @@
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List, NamedTuple, Optional
+
+import orjson
+from sqlalchemy import Float, ForeignKey, Integer, String, Text, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, SessionLocal, engine
+
+# --- Candidate Statuses ---
+
+STATUS_GENERATING = "generating"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+STATUS_COMPLETED = "completed"
+
+
+class DocumentNotFound(KeyError):
+    pass
+
+
+class Document(NamedTuple):
+    data: Any
+    version: Any
+    size: int
+
+
+def _is_json(name: str) -> bool:
+    return name.endswith(".json")
+
+
+class CandidateStore(ABC):
+    # Per-candidate state: a status plus named documents such as "job_desc.json" or
+    # "testoutput/profile.json". ".json" documents hold JSON data, anything else plain text.
+    # Binary uploads (resume, audio) always stay in the candidate folder on disk.
+
+    @abstractmethod
+    def create_candidate(self, candidate_id: str, status: str = STATUS_GENERATING):
+        ...
+
+    @abstractmethod
+    def get_status(self, candidate_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set_status(self, candidate_id: str, status: str):
+        ...
+
+    @abstractmethod
+    def count_by_status(self, status: str) -> int:
+        ...
+
+    @abstractmethod
+    def save_document(self, candidate_id: str, name: str, data) -> Document:
+        ...
+
+    @abstractmethod
+    def read_document(self, candidate_id: str, name: str) -> Document:
+        ...
+
+    @abstractmethod
+    def document_version(self, candidate_id: str, name: str):
+        ...
+
+    @abstractmethod
+    def list_documents(self, candidate_id: str) -> List[str]:
+        ...
+
+    def load_document(self, candidate_id: str, name: str):
+        return self.read_document(candidate_id, name).data
+
+    def has_document(self, candidate_id: str, name: str) -> bool:
+        return self.document_version(candidate_id, name) is not None
+
+    def export_document(self, candidate_id: str, name: str) -> Document:
+        # Serialized the way the filesystem backend lays it out, for the result ZIP
+        document = self.read_document(candidate_id, name)
+        if _is_json(name):
+            body = json.dumps(document.data, indent=2).encode("utf-8")
+        else:
+            body = document.data.encode("utf-8")
+        return Document(body, document.version, len(body))
+
+
+# --- Filesystem Backend ---
+
+class FileSystemStore(CandidateStore):
+    # The original layout: STORAGE_DIR/<candidate_id>/<name>, one file per document.
+
+    STATUS_FILE = "status.json"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, candidate_id: str, name: str) -> str:
+        return os.path.join(self.root, candidate_id, *name.split("/"))
+
+    def create_candidate(self, candidate_id: str, status: str = STATUS_GENERATING):
+        os.makedirs(os.path.join(self.root, candidate_id), exist_ok=True)
+        self.set_status(candidate_id, status)
+
+    def get_status(self, candidate_id: str) -> Optional[str]:
+        try:
+            return self.load_document(candidate_id, self.STATUS_FILE)["status"]
+        except DocumentNotFound:
+            return None
+
+    def set_status(self, candidate_id: str, status: str):
+        self.save_document(candidate_id, self.STATUS_FILE, {"status": status, "updated_at": time.time()})
+
+    def count_by_status(self, status: str) -> int:
+        # No index on disk: this has to open every candidate's status file
+        count = 0
+        for candidate_id in os.listdir(self.root):
+            if os.path.isdir(os.path.join(self.root, candidate_id)) and self.get_status(candidate_id) == status:
+                count += 1
+        return count
+
+    def save_document(self, candidate_id: str, name: str, data) -> Document:
+        path = self._path(candidate_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        text = json.dumps(data, indent=2) if _is_json(name) else data
+        # Write-then-rename so readers never see a partially written document; the temp file is
+        # unique so concurrent writers of the same document never share one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                # Flushed first, or the size would not count what is still buffered. Taken from
+                # this file rather than the path, which a concurrent writer may already have replaced.
+                f.flush()
+                stat = os.fstat(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return Document(data, (stat.st_mtime_ns, stat.st_size), len(text))
+
+    def read_document(self, candidate_id: str, name: str) -> Document:
+        try:
+            with open(self._path(candidate_id, name), "r", encoding="utf-8") as f:
+                text = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            raise DocumentNotFound(f"{candidate_id}/{name}")
+        data = json.loads(text) if _is_json(name) else text
+        return Document(data, (stat.st_mtime_ns, stat.st_size), len(text))
+
+    def document_version(self, candidate_id: str, name: str):
+        try:
+            stat = os.stat(self._path(candidate_id, name))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def list_documents(self, candidate_id: str) -> List[str]:
+        folder = os.path.join(self.root, candidate_id)
+        names = []
+        for foldername, subfolders, filenames in os.walk(folder):
+            for filename in filenames:
+                if filename.endswith((".json", ".txt")) and filename != self.STATUS_FILE:
+                    names.append(os.path.relpath(os.path.join(foldername, filename), folder).replace(os.sep, "/"))
+        return names
+
+
+# --- SQL Backend ---
+
+class Candidate(Base):
+    __tablename__ = "candidates"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), index=True)
+    created_at: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[float] = mapped_column(Float)
+
+
+class CandidateDocument(Base):
+    __tablename__ = "candidate_documents"
+
+    # The (candidate_id, name) primary key doubles as the candidate id index
+    candidate_id: Mapped[str] = mapped_column(String(36), ForeignKey("candidates.id"), primary_key=True)
+    name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    body: Mapped[str] = mapped_column(Text)
+    version: Mapped[int] = mapped_column(Integer)
+    updated_at: Mapped[float] = mapped_column(Float)
+
+
+class SQLStore(CandidateStore):
+    # Documents live in one indexed table, stored as compact JSON.
+
+    def create_candidate(self, candidate_id: str, status: str = STATUS_GENERATING):
+        now = time.time()
+        with SessionLocal() as session:
+            session.add(Candidate(id=candidate_id, status=status, created_at=now, updated_at=now))
+            session.commit()
+
+    # Reads go through plain Core connections: an ORM session per lookup costs more than the query
+    def get_status(self, candidate_id: str) -> Optional[str]:
+        with engine.connect() as connection:
+            return connection.scalar(select(Candidate.status).where(Candidate.id == candidate_id))
+
+    def set_status(self, candidate_id: str, status: str):
+        with SessionLocal() as session:
+            session.execute(
+                update(Candidate).where(Candidate.id == candidate_id).values(status=status, updated_at=time.time())
+            )
+            session.commit()
+
+    def count_by_status(self, status: str) -> int:
+        with engine.connect() as connection:
+            return connection.scalar(select(func.count()).select_from(Candidate).where(Candidate.status == status))
+
+    def save_document(self, candidate_id: str, name: str, data) -> Document:
+        body = orjson.dumps(data).decode("utf-8") if _is_json(name) else data
+        now = time.time()
+        with SessionLocal() as session:
+            if session.bind.dialect.name == "sqlite":
+                statement = sqlite_insert(CandidateDocument).values(
+                    candidate_id=candidate_id, name=name, body=body, version=1, updated_at=now
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=["candidate_id", "name"],
+                    set_={"body": body, "version": CandidateDocument.version + 1, "updated_at": now},
+                ).returning(CandidateDocument.version)
+                # The version this write produced, not whatever a later writer committed since
+                version = session.scalar(statement)
+            else:
+                # The row lock keeps the version read and its increment in one transaction
+                document = session.get(CandidateDocument, (candidate_id, name), with_for_update=True)
+                if document is None:
+                    session.add(CandidateDocument(candidate_id=candidate_id, name=name, body=body,
+                                                  version=1, updated_at=now))
+                    version = 1
+                else:
+                    document.body, document.version, document.updated_at = body, document.version + 1, now
+                    version = document.version
+            session.commit()
+        return Document(data, version, len(body))
+
+    def read_document(self, candidate_id: str, name: str) -> Document:
+        with engine.connect() as connection:
+            row = connection.execute(
+                select(CandidateDocument.body, CandidateDocument.version)
+                .where(CandidateDocument.candidate_id == candidate_id, CandidateDocument.name == name)
+            ).first()
+        if row is None:
+            raise DocumentNotFound(f"{candidate_id}/{name}")
+        body, version = row
+        data = orjson.loads(body) if _is_json(name) else body
+        return Document(data, version, len(body))
+
+    def document_version(self, candidate_id: str, name: str):
+        with engine.connect() as connection:
+            return connection.scalar(
+                select(CandidateDocument.version)
+                .where(CandidateDocument.candidate_id == candidate_id, CandidateDocument.name == name)
+            )
+
+    def list_documents(self, candidate_id: str) -> List[str]:
+        with engine.connect() as connection:
+            return list(connection.scalars(
+                select(CandidateDocument.name).where(CandidateDocument.candidate_id == candidate_id)
+            ))
+
+
+def create_store(backend: str, root: str) -> CandidateStore:
+    if backend == "filesystem":
+        return FileSystemStore(root)
+    if backend == "sql":
+        return SQLStore()
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,94 @@
+import os
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Similarity at or above which a theory answer gets full marks
+THEORY_FULL_MARKS_SIMILARITY = float(os.environ.get("THEORY_FULL_MARKS_SIMILARITY", 0.6))
+# Answers scoring inside this band are flagged for the report LLM to look at
+THEORY_REVIEW_LOW = float(os.environ.get("THEORY_REVIEW_LOW", 0.2))
+THEORY_REVIEW_HIGH = float(os.environ.get("THEORY_REVIEW_HIGH", 0.5))
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+    a an and are as at be been being but by can could did do does for from had has have how if in into is it its
+    may more most not of on or should so such than that the their them then there these they this those to
+    was we were what when where which while who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS and len(word) > 1]
+
+
+def similarity_scores(submitted: Sequence[str], expected: Sequence[str],
+                      groups: Optional[Sequence[int]] = None) -> np.ndarray:
+    # TF-IDF cosine similarity of each submitted answer with its expected answer, for any number
+    # of pairs in one vectorized pass. Document frequencies are counted within each group (one
+    # group per candidate), so a candidate scores the same alone or as part of a cohort.
+    pairs = len(submitted)
+    if pairs == 0:
+        return np.zeros(0)
+    groups = np.zeros(pairs, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+
+    # Document 2p is the submitted answer of pair p, 2p + 1 its expected answer
+    vocabulary = {}
+    doc_ids, term_ids = [], []
+    for doc, text in enumerate(t for pair in zip(submitted, expected) for t in pair):
+        for word in tokenize(text):
+            doc_ids.append(doc)
+            term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+    if not term_ids:
+        return np.zeros(pairs)
+    vocab_size = len(vocabulary)
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+
+    # Term frequencies per (document, term)
+    doc_terms, tf = np.unique(doc_ids * vocab_size + term_ids, return_counts=True)
+    docs, terms = np.divmod(doc_terms, vocab_size)
+    doc_groups = groups[docs // 2]
+
+    # Document frequencies per (group, term)
+    _, inverse, df = np.unique(doc_groups * vocab_size + terms, return_inverse=True, return_counts=True)
+    group_docs = 2 * np.bincount(groups)
+    idf = np.log((1 + group_docs[doc_groups]) / (1 + df[inverse])) + 1
+    weights = (1 + np.log(tf)) * idf
+
+    norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=2 * pairs))
+    submitted_side = docs % 2 == 0
+    expected_side = ~submitted_side
+    pair_terms_submitted = (docs[submitted_side] // 2) * vocab_size + terms[submitted_side]
+    pair_terms_expected = (docs[expected_side] // 2) * vocab_size + terms[expected_side]
+    shared, index_submitted, index_expected = np.intersect1d(
+        pair_terms_submitted, pair_terms_expected, assume_unique=True, return_indices=True)
+    dots = np.bincount(shared // vocab_size,
+                       weights=weights[submitted_side][index_submitted] * weights[expected_side][index_expected],
+                       minlength=pairs)
+
+    denominators = norms[0::2] * norms[1::2]
+    return np.divide(dots, denominators, out=np.zeros(pairs), where=denominators > 0)
+
+
+def score_fractions(similarities: np.ndarray) -> np.ndarray:
+    # Share of a question's marks earned
+    return np.clip(similarities / THEORY_FULL_MARKS_SIMILARITY, 0.0, 1.0)
+
+
+def needs_review(similarities: np.ndarray) -> np.ndarray:
+    return (similarities >= THEORY_REVIEW_LOW) & (similarities < THEORY_REVIEW_HIGH)
+
+
+def cohort_similarities(cohort: List[List[dict]]) -> List[np.ndarray]:
+    # Scores the theory answers of many candidates in one pass; returns one array per candidate
+    submitted, expected, groups = [], [], []
+    for group, answers in enumerate(cohort):
+        for answer in answers:
+            submitted.append(answer["submitted_answer"])
+            expected.append(answer["expected_answer"])
+            groups.append(group)
+    similarities = similarity_scores(submitted, expected, groups)
+    bounds = np.cumsum([len(answers) for answers in cohort])[:-1]
+    return np.split(similarities, bounds) if cohort else []
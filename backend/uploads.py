@@ -0,0 +1,106 @@
+import os
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Room for multipart boundaries and part headers on top of the file limits
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes // 1024} KB limit.")
+
+
+async def save_upload(upload: UploadFile, path: str, max_bytes: int) -> int:
+    # Copy in chunks with disk writes on the threadpool so large files never block the event loop
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    partial_path = path + ".part"
+    written = 0
+    buffer = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > max_bytes:
+                raise _too_large(max_bytes)
+            await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        os.remove(partial_path)
+        raise
+    await run_in_threadpool(buffer.close)
+    os.replace(partial_path, path)
+    return written
+
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise _too_large(max_bytes)
+    return data
+
+
+def extract_zip_member(archive, info, path: str, max_bytes: int):
+    # The declared size in the archive can't be trusted, so the limit is enforced while copying
+    partial_path = path + ".part"
+    written = 0
+    try:
+        with archive.open(info) as source, open(partial_path, "wb") as target:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ValueError(f"File exceeds the {max_bytes // 1024} KB limit.")
+                target.write(chunk)
+    except BaseException:
+        os.remove(partial_path)
+        raise
+    os.replace(partial_path, path)
+    return written
+
+
+class RequestSizeLimitMiddleware:
+    # Rejects oversized upload requests while they stream in, before the multipart parser
+    # spools the whole body to a temporary file. `limits` maps path prefixes to byte limits.
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path: str):
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": f"Request exceeds the {limit // 1024} KB limit."}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, FastAPI turns it into a 413 response
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
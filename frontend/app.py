@@ -1,8 +1,30 @@
 import streamlit as st
 import requests
+import json
 import tempfile
 import time
 
+import backend_client
+
+# Applied to every text area on the page, so it is written once per page rather than per question
+TEXTAREA_CSS = """
+<style>
+textarea {
+    border: 2px solid #4A90E2 !important;
+    border-radius: 8px !important;
+    padding: 10px !important;
+}
+</style>
+"""
+
+def autosave(candidate_id, section, index, widget_key, field="submitted_answer"):
+    # on_change callback: each answer reaches the backend as soon as the candidate changes it
+    answer = {field: st.session_state[widget_key]}
+    if section == "coding":
+        answer["language"] = "python"
+    if not backend_client.save_answer(candidate_id, section, index, answer):
+        st.toast("Could not autosave your answer. It is kept on this page, please submit before leaving.")
+
 # --- Welcome Page ---
 def welcome_page():
     st.title("👋 Welcome to the Exam!")
@@ -21,7 +43,7 @@ def welcome_page():
     if (uploaded_file is not None and exam_details_file is not None):
         files = {"resume": uploaded_file, "exam_details": exam_details_file}
         # Upload the resume to the backend and get the candidate ID
-        response = requests.post("http://127.0.0.1:8000/upload_resume", files=files, data= {})
+        response = backend_client.post("/upload_resume", files=files, data= {})
         if response.status_code == 200:
             st.session_state.candidate_id = response.json()['candidate_id']
             st.session_state.page = "Audio Recording"  # Redirect to Audio Recording Page
@@ -48,8 +70,8 @@ def audio_page():
         # Upload the audio to the backend
         if st.button("Upload Audio"):
             files = {"audio": open(tmp_file_path, "rb")}
-            upload_response = requests.post(f"http://127.0.0.1:8000/upload_audio/{st.session_state.candidate_id}",
-                                            files=files)
+            upload_response = backend_client.post(f"/upload_audio/{st.session_state.candidate_id}",
+                                                  files=files)
 
             if upload_response.status_code == 200:
                 st.success("Audio uploaded successfully!")
@@ -62,41 +84,42 @@ def mcq_page():
     st.title("🧠 MCQ Section")
 
     candidate_id = st.session_state.candidate_id
-    max_retries = 10
-    retry_delay = 2  # seconds
+    max_wait = 600  # seconds
 
     with st.spinner("Fetching your MCQs... Please wait."):
-        for attempt in range(max_retries):
-            response = requests.get(f"http://127.0.0.1:8000/get_mcq/{candidate_id}")
+        deadline = time.time() + max_wait
+        while True:
+            # Long-polls the backend on the first render only, later reruns use the session copy
+            status_code, mcqs = backend_client.fetch_section(candidate_id, "mcq")
 
-            if response.status_code == 200:
-                mcqs = response.json()
+            if status_code == 200:
                 break  # Success, exit the loop
-            else:
-                time.sleep(retry_delay)
-        else:
-            st.error("Failed to fetch MCQs after several attempts. Please try again later.")
-            return  # Stop further execution of the page
+            if status_code != 202 or time.time() > deadline:
+                st.error("Failed to fetch MCQs. Please try again later.")
+                return  # Stop further execution of the page
 
     mcq_answers = []  # To store answers
+    draft = backend_client.load_draft(candidate_id).get("mcq", {})
 
     for i, mcq in enumerate(mcqs):
         st.markdown("---")
         question_no = i + 1
         question = mcq['question']
         options = mcq['options']
-        answer = st.radio(f"**{question_no}. {question}**", options, index=None)
+        saved = draft.get(str(i), {}).get("submitted_answer")
+        answer = st.radio(f"**{question_no}. {question}**", options,
+                          index=options.index(saved) if saved in options else None, key=f"mcq{i}",
+                          on_change=autosave, args=(candidate_id, "mcq", i, f"mcq{i}"))
         mcq_answers.append({
             "question": question,
             "options": options,
-            "correct_answer": mcq["answer"],
             "submitted_answer": answer
         })
 
     st.markdown("---")
     if st.button("Submit All Answers"):
         submit_data = {"candidate_id": candidate_id, "submitted_mcqs": mcq_answers}
-        submit_response = requests.post(f"http://127.0.0.1:8000/submit_all_mcq_answers/", json=submit_data)
+        submit_response = backend_client.post("/submit_all_mcq_answers/", json=submit_data)
 
         if submit_response.status_code == 200:
             st.success("All MCQ answers submitted successfully!")
@@ -114,34 +137,22 @@ def mcq_page():
 def theory_page():
     st.title("💻 Theory Section")
 
-    # Get Coding Questions from backend
-    response = requests.get(f"http://127.0.0.1:8000/get_theory_question/{st.session_state.candidate_id}")
-    if response.status_code == 200:
-        theory_questions = response.json()
+    # Get Theory Questions from backend, once per candidate
+    status_code, theory_questions = backend_client.fetch_section(st.session_state.candidate_id, "theory")
+    if status_code == 200:
+        st.markdown(TEXTAREA_CSS, unsafe_allow_html=True)
         theory_answers = []  # To store coding answers
+        draft = backend_client.load_draft(st.session_state.candidate_id).get("theory", {})
 
         for i, theory in enumerate(theory_questions):
             question = theory['question']
-            expected_answer = theory['expected_answer']
             st.subheader(f"{i + 1}. {question}")
 
-            # Custom CSS for textarea
-            st.markdown(
-                """
-                <style>
-                textarea {
-                    border: 2px solid #4A90E2 !important;
-                    border-radius: 8px !important;
-                    padding: 10px !important;
-                }
-                </style>
-                """,
-                unsafe_allow_html=True,
-            )
-            submitted_answer = st.text_area(f"Answer here", height=150, key=f"question{i}")
+            submitted_answer = st.text_area(f"Answer here", value=draft.get(str(i), {}).get("submitted_answer") or "",
+                                            height=150, key=f"question{i}", on_change=autosave,
+                                            args=(st.session_state.candidate_id, "theory", i, f"question{i}"))
             theory_answers.append({
                 "question": question,
-                "expected_answer": expected_answer,
                 "submitted_answer": submitted_answer
             })
             st.write("")
@@ -150,7 +161,7 @@ def theory_page():
         # Submit all theory answers at once
         if st.button("Submit All Theory Answers"):
             submit_data = {"candidate_id": st.session_state.candidate_id, "submitted_theory_questions": theory_answers}
-            submit_response = requests.post(f"http://127.0.0.1:8000/submit_all_theory_answers/", json=submit_data)
+            submit_response = backend_client.post("/submit_all_theory_answers/", json=submit_data)
 
             if submit_response.status_code == 200:
                 st.success("All theory answers submitted successfully!")
@@ -158,6 +169,11 @@ def theory_page():
                 st.rerun()
             else:
                 st.error("Failed to submit theory answers. Please try again.")
+    elif status_code == 202:
+        # Sections are generated independently, theory may still be in progress
+        st.info("Theory questions are still being generated. Please refresh in a moment.")
+        if st.button("Refresh"):
+            st.rerun()
 
     if st.button("Next to Coding Question"):
         st.session_state.page = "Coding Question"
@@ -172,6 +188,7 @@ def coding_page():
 
     st.text("")
     st.text("You can use following compilers to run the test cases.\nPlease copy and paste the code in appropraite block below.")
+    st.info("Python solutions are run against hidden test cases: read the input from standard input and print the result.")
     st.subheader("Online Compilers")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -184,11 +201,12 @@ def coding_page():
         st.link_button("Java Script Compiler", "https://www.programiz.com/javascript/online-compiler")
     st.markdown("---")
 
-    # Get Coding Questions from backend
-    response = requests.get(f"http://127.0.0.1:8000/get_coding_question/{st.session_state.candidate_id}")
-    if response.status_code == 200:
-        coding_questions = response.json()
+    # Get Coding Questions from backend, once per candidate
+    status_code, coding_questions = backend_client.fetch_section(st.session_state.candidate_id, "coding")
+    if status_code == 200:
+        st.markdown(TEXTAREA_CSS, unsafe_allow_html=True)
         coding_answers = []  # To store coding answers
+        draft = backend_client.load_draft(st.session_state.candidate_id).get("coding", {})
 
         for i, coding in enumerate(coding_questions):
             question_name = coding['name']
@@ -209,20 +227,10 @@ def coding_page():
                     st.markdown(f"**Expected Output:** `{expected_output}`")
                     st.markdown(f"**Explanation:** {example_description}")
 
-            # Custom CSS for textarea
-            st.markdown(
-                """
-                <style>
-                textarea {
-                    border: 2px solid #4A90E2 !important;
-                    border-radius: 8px !important;
-                    padding: 10px !important;
-                }
-                </style>
-                """,
-                unsafe_allow_html=True,
-            )
-            code = st.text_area(f"Enter code for **{question_name}** here", height=200)
+            code = st.text_area(f"Enter code for **{question_name}** here",
+                                value=draft.get(str(i), {}).get("submitted_code") or "", height=200, key=f"code{i}",
+                                on_change=autosave,
+                                args=(st.session_state.candidate_id, "coding", i, f"code{i}", "submitted_code"))
             coding_answers.append({
                 "question_name": question_name,
                 "question_description": description,
@@ -236,7 +244,7 @@ def coding_page():
         if st.button("Submit All Coding Answers"):
             # Send all coding answers in a single API call
             submit_data = {"candidate_id": st.session_state.candidate_id, "submitted_coding_questions": coding_answers}
-            submit_response = requests.post(f"http://127.0.0.1:8000/submit_all_coding_answers/", json=submit_data)
+            submit_response = backend_client.post("/submit_all_coding_answers/", json=submit_data)
 
             if submit_response.status_code == 200:
                 st.success("All coding answers submitted successfully!")
@@ -244,80 +252,107 @@ def coding_page():
                 st.rerun()  # Trigger the page change
             else:
                 st.error("Failed to submit coding answers. Please try again.")
+    elif status_code == 202:
+        # Sections are generated independently, coding may still be in progress
+        st.info("Coding questions are still being generated. Please refresh in a moment.")
+        if st.button("Refresh"):
+            st.rerun()
 
     if st.button("Finish Test"):
         st.session_state.page = "Final Result"
         st.rerun()
 
+def clean_report_text(final_report_text):
+    # Clean up code block markers if present
+    if final_report_text.startswith("```text"):
+        final_report_text = final_report_text[7:]
+        if final_report_text.endswith("```"):
+            final_report_text = final_report_text[:-3]
+    return final_report_text.strip()
+
+def render_report(placeholder, final_report_text):
+    # Show the rest of the report in smaller font
+    placeholder.markdown(
+        f"<div style='font-size: 14px; line-height: 1.6; color: #444;'>{clean_report_text(final_report_text).replace(chr(10), '<br>')}</div>",
+        unsafe_allow_html=True
+    )
+
+def iter_sse(response):
+    # Yields (event, data) pairs from a text/event-stream response
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[5:].strip())
+        elif not line:
+            event = "message"
+
+SECTION_TITLES = {"mcq": "MCQ", "theory": "Theory", "coding": "Coding"}
+
+def generate_final_result():
+    # The report is rendered while the backend streams it, token by token
+    final_report_text = ""
+    result_data = None
+    try:
+        with backend_client.get(
+            "/stream_final_result/",
+            params={"candidate_id": st.session_state.candidate_id},
+            stream=True,
+            timeout=(backend_client.BACKEND_CONNECT_TIMEOUT, 120)
+        ) as stream_response:
+            if stream_response.status_code != 200:
+                st.error("Failed to generate final result. Please try again.")
+                return
+            for event, data in iter_sse(stream_response):
+                if event == "start":
+                    st.header(data["candidate_name"].replace("_", " "))
+                    score_placeholder = st.empty()
+                    st.subheader("Final Report Summary")
+                    report_placeholder = st.empty()
+                    report_placeholder.caption("Generating Final Result...")
+                elif event == "token":
+                    final_report_text += data
+                    render_report(report_placeholder, final_report_text)
+                elif event == "done":
+                    result_data = data
+                elif event == "error":
+                    st.error(data["detail"])
+                    return
+    except requests.RequestException:
+        st.error("Lost connection while generating the final result. Please try again.")
+        return
+
+    if result_data is None:
+        st.error("Failed to generate final result. Please try again.")
+        return
+
+    st.success("Final result generated successfully!")
+    # Marks are computed by the backend, not parsed out of the report text
+    scores = result_data["scores"]
+    with score_placeholder.container():
+        st.markdown(f"### 🏆 Final Score: **{scores['obtained']} / {scores['total']}**")
+        if scores.get("pending"):
+            st.caption(f"{scores['pending']} question(s) pending review, not included in the score.")
+        columns = st.columns(len(scores["sections"]))
+        for column, (section, section_scores) in zip(columns, scores["sections"].items()):
+            column.metric(SECTION_TITLES.get(section, section), f"{section_scores['obtained']} / {section_scores['total']}")
+
+    # The browser streams the ZIP straight from the backend, it is never held in memory here
+    st.link_button(
+        "Download Final Result ZIP",
+        backend_client.public_url(result_data['download_url'])
+    )
+
 def final_result_page():
     st.title("Download Your Final Result")
 
     if st.button("Generate and Download Final Result"):
-        with st.spinner("Generating Final Result..."):
-            generate_response = requests.post(
-                f"http://127.0.0.1:8000/generate_final_result/",
-                params={"candidate_id": st.session_state.candidate_id}
-            )
-
-        if generate_response.status_code == 200:
-            st.success("Final result ZIP generated successfully!")
-            result_data = generate_response.json()
-            candidate_name = result_data["candidate_name"]
-
-            # Download the ZIP
-            download_response = requests.get(
-                f"http://127.0.0.1:8000/download_zip/",
-                params={"candidate_id": st.session_state.candidate_id},
-                stream=True
-            )
-
-            if download_response.status_code == 200:
-                zip_content = download_response.content
-                st.download_button(
-                    label="Download Final Result ZIP",
-                    data=zip_content,
-                    file_name=f"{candidate_name}_Final_Result.zip",
-                    mime="application/zip"
-                )
-            else:
-                st.error("Failed to download final result ZIP. Please try again.")
-
-            # Fetch and display the Final Report Text
-            report_response = requests.get(
-                f"http://127.0.0.1:8000/get_final_report/",
-                params={"candidate_id": st.session_state.candidate_id}
-            )
-
-            if report_response.status_code == 200:
-                report_data = report_response.json()
-                final_report_text = report_data["final_report"]
-
-                # Clean up code block markers if present
-                if final_report_text.startswith("```text") and final_report_text.endswith("```"):
-                    final_report_text = final_report_text[7:-3].strip()
-
-                st.header(candidate_name.replace("_", " "))
-                import re
-                matches = re.findall(r"Marks:\s*(\d+)/(\d+)", final_report_text)
-                if matches:
-                    obtained_marks, total_marks = matches[-1]  # 👈 pick the last occurrence
-                    st.markdown(f"### 🏆 Final Score: **{obtained_marks} / {total_marks}**")
-                else:
-                    st.warning("Could not extract marks from report.")
-
-                # Show the rest of the report in smaller font
-                st.subheader("Final Report Summary")
-                st.markdown(
-                    f"<div style='font-size: 14px; line-height: 1.6; color: #444;'>{final_report_text.replace(chr(10), '<br>')}</div>",
-                    unsafe_allow_html=True
-                )
-            else:
-                st.error("Failed to fetch final report. Please try again.")
-        else:
-            st.error("Failed to generate final result. Please try again.")
+        generate_final_result()
 
     st.text("")
     if st.button("End Test"):
+        backend_client.forget_candidate(st.session_state.candidate_id)
         st.session_state.page = "Welcome Page"
         st.rerun()
 
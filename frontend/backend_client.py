@@ -0,0 +1,111 @@
+import os
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Address the Streamlit server uses to reach the backend
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:8000").rstrip("/")
+# Address the candidate's browser uses for links such as the ZIP download; differs behind a proxy
+BACKEND_PUBLIC_URL = os.environ.get("BACKEND_PUBLIC_URL", BACKEND_URL).rstrip("/")
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", 5))
+BACKEND_READ_TIMEOUT = float(os.environ.get("BACKEND_READ_TIMEOUT", 60))
+# Keep-alive connections to the backend shared by every browser session of this process
+BACKEND_POOL_SIZE = int(os.environ.get("BACKEND_POOL_SIZE", 32))
+
+# Seconds the backend holds a question request until the section is published
+POLL_WAIT = 25
+# Autosaves run inside widget callbacks, so they give up quickly rather than stall the page
+AUTOSAVE_TIMEOUT = float(os.environ.get("AUTOSAVE_TIMEOUT", 5))
+AUTOSAVE_ATTEMPTS = int(os.environ.get("AUTOSAVE_ATTEMPTS", 2))
+
+
+# --- HTTP Session ---
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    # Created once per Streamlit process, so reruns reuse open connections instead of reconnecting
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request(method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+    timeout = timeout or (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT)
+    return get_session().request(method, f"{BACKEND_URL}{path}", timeout=timeout, **kwargs)
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request("POST", path, **kwargs)
+
+
+def public_url(path: str) -> str:
+    return f"{BACKEND_PUBLIC_URL}{path}"
+
+
+# --- Questions ---
+
+def fetch_section(candidate_id: str, section: str, wait: int = POLL_WAIT):
+    # Returns (status_code, questions) from the candidate's exam bundle. A complete bundle is kept
+    # for the session, so reruns (every click or keystroke) never reach the backend; a partial one
+    # is revalidated with its ETag and only downloaded again once more sections are published.
+    exams = st.session_state.setdefault("exams", {})
+    cached = exams.get(candidate_id)
+    if cached is None or section in cached["exam"]["pending"]:
+        headers = {"If-None-Match": cached["etag"]} if cached else {}
+        response = get(f"/get_exam/{candidate_id}", params={"wait": wait, "section": section}, headers=headers,
+                       timeout=(BACKEND_CONNECT_TIMEOUT, wait + 10))
+        if response.status_code == 200:
+            cached = exams[candidate_id] = {"etag": response.headers.get("ETag"), "exam": response.json()}
+        elif response.status_code != 304:
+            return response.status_code, None
+    if section in cached["exam"]["pending"]:
+        return 202, None
+    return 200, cached["exam"]["sections"][section]
+
+
+# --- Answers ---
+
+def load_draft(candidate_id: str) -> dict:
+    # Answers autosaved before a reload or a lost session, fetched once and then kept up to date
+    # by save_answer. {section: {question index (str): answer}}
+    drafts = st.session_state.setdefault("drafts", {})
+    if candidate_id not in drafts:
+        try:
+            response = get(f"/answers/{candidate_id}")
+            drafts[candidate_id] = response.json()["answers"] if response.status_code == 200 else {}
+        except requests.RequestException:
+            drafts[candidate_id] = {}
+    return drafts[candidate_id]
+
+
+def save_answer(candidate_id: str, section: str, index: int, answer: dict) -> bool:
+    # The revision orders saves of the same question on the backend, and the idempotency key makes
+    # the retry safe when the first attempt did land
+    revision = time.time_ns()
+    headers = {"Idempotency-Key": f"{section}:{index}:{revision}"}
+    for _ in range(AUTOSAVE_ATTEMPTS):
+        try:
+            response = request("PUT", f"/answers/{candidate_id}/{section}/{index}",
+                               json={"revision": revision, **answer}, headers=headers,
+                               timeout=(BACKEND_CONNECT_TIMEOUT, AUTOSAVE_TIMEOUT))
+        except requests.RequestException:
+            continue
+        if response.status_code == 200:
+            load_draft(candidate_id).setdefault(section, {})[str(index)] = answer
+            return True
+        if response.status_code < 500:
+            return False
+    return False
+
+
+def forget_candidate(candidate_id: str):
+    st.session_state.get("exams", {}).pop(candidate_id, None)
+    st.session_state.get("drafts", {}).pop(candidate_id, None)